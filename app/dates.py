@@ -0,0 +1,121 @@
+import datetime
+import functools
+
+import numpy as np
+
+# ====================== CONSTANTS ======================
+# All date math works on proleptic Gregorian ordinals (datetime.date.toordinal()), so a
+# birthday lookup is one table read and days_since is a subtraction.
+
+MAX_SPREAD_YEAR = 90   # Spread years are clamped to 1..90
+PERIOD_DAYS = 52       # Each planetary period lasts 52 days
+LAST_PERIOD = 6        # Neptune absorbs the leftover days of the year
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()  # datetime64[D] day 0
+
+# Birthdays are keyed by slot = (month - 1) * 31 + (day - 1), covering every month/day a
+# caller can pass. A day that does not exist in a given year (Feb 29 in a common year, or an
+# impossible date) is treated as Mar 1 of that year, as the engine always has.
+_SLOTS = 12 * 31
+_MARCH_1_SLOT = 2 * 31
+
+def birthday_slot(month: int, day: int):
+    """Table slot for a birth month/day; out-of-range dates share the Mar 1 slot."""
+    if 1 <= month <= 12 and 1 <= day <= 31:
+        return (month - 1) * 31 + (day - 1)
+    return _MARCH_1_SLOT
+
+# ====================== BIRTHDAY TABLES ======================
+
+@functools.lru_cache(maxsize=512)
+def birthday_ordinals(year: int):
+    """Ordinal of every birthday slot in a given year (invalid days mapped to Mar 1)."""
+    march_1 = datetime.date(year, 3, 1).toordinal()
+    table = [march_1] * _SLOTS
+    for month in range(1, 13):
+        first = datetime.date(year, month, 1).toordinal()
+        next_month = datetime.date(year + month // 12, month % 12 + 1, 1).toordinal()
+        for day in range(1, next_month - first + 1):
+            table[(month - 1) * 31 + (day - 1)] = first + day - 1
+    return tuple(table)
+
+@functools.lru_cache(maxsize=512)
+def _birthday_ordinals_array(year: int):
+    return np.array(birthday_ordinals(year), dtype=np.int64)
+
+def _birthday_table(first_year: int, last_year: int):
+    """Stacks the birthday tables for a run of years: [year - first_year, slot] -> ordinal."""
+    return np.stack([_birthday_ordinals_array(year) for year in range(first_year, last_year + 1)])
+
+# ====================== TARGET DATES ======================
+
+@functools.lru_cache(maxsize=4096)
+def parse_target_date(date_str: str):
+    """Parses 'YYYY-MM-DD' into (year, ordinal); repeated target dates are free."""
+    year, month, day = (int(part) for part in date_str.split("-"))
+    return year, datetime.date(year, month, day).toordinal()
+
+def target_day(target):
+    """(year, ordinal) for a target given as an ISO string or a date."""
+    if isinstance(target, str):
+        return parse_target_date(target)
+    return target.year, target.toordinal()
+
+# ====================== SCALAR ======================
+
+def last_birthday(birth_month: int, birth_day: int, target_year: int, target_ordinal: int):
+    """Ordinal and year of the most recent birthday on or before the target day."""
+    slot = birthday_slot(birth_month, birth_day)
+    bday = birthday_ordinals(target_year)[slot]
+    if bday <= target_ordinal:
+        return bday, target_year
+    return birthday_ordinals(target_year - 1)[slot], target_year - 1
+
+def period_index(days_since: int):
+    """Planetary period (0 = Mercury ... 6 = Neptune) for a day of the personal year."""
+    return min((days_since - 1) // PERIOD_DAYS, LAST_PERIOD)
+
+def spread_position(birth_year: int, birth_month: int, birth_day: int, target_year: int, target_ordinal: int):
+    """Returns (age, days_since, spread_year, period_idx, last_birthday_ordinal)."""
+    bday, bday_year = last_birthday(birth_month, birth_day, target_year, target_ordinal)
+    age = bday_year - birth_year
+    days_since = target_ordinal - bday + 1
+    spread_year = min(max(age + 1, 1), MAX_SPREAD_YEAR)
+    return age, days_since, spread_year, period_index(days_since), bday
+
+# ====================== VECTORIZED ======================
+
+def birthday_slots(birth_months, birth_days):
+    """Vectorized birthday_slot."""
+    months = np.asarray(birth_months, dtype=np.int64)
+    days = np.asarray(birth_days, dtype=np.int64)
+    in_range = (months >= 1) & (months <= 12) & (days >= 1) & (days <= 31)
+    return np.where(in_range, (months - 1) * 31 + (days - 1), _MARCH_1_SLOT)
+
+def spread_positions(birth_years, birth_months, birth_days, target_dates):
+    """Vectorized spread_position.
+
+    target_dates is one date (ISO string, date or datetime64) or one per row. Returns
+    (age, days_since, spread_year, period_idx) as int64 arrays.
+    """
+    years = np.asarray(birth_years, dtype=np.int64)
+    slots = birthday_slots(birth_months, birth_days)
+    target_dates = np.asarray(target_dates, dtype="datetime64[D]")
+    target_years = target_dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    targets = target_dates.astype(np.int64) + EPOCH_ORDINAL
+
+    # One table row per target year in play (plus the year before, for birthdays still ahead)
+    first_year = int(target_years.min()) - 1 if target_years.size else 0
+    table = _birthday_table(first_year, int(target_years.max()) if target_years.size else 0)
+    year_rows = np.broadcast_to(target_years - first_year, years.shape)
+    targets = np.broadcast_to(targets, years.shape)
+
+    bday = table[year_rows, slots]
+    before = bday > targets
+    if before.any():
+        bday = np.where(before, table[year_rows - 1, slots], bday)
+    age = np.broadcast_to(target_years, years.shape) - before - years
+    days_since = targets - bday + 1
+    spread_year = np.clip(age + 1, 1, MAX_SPREAD_YEAR)
+    period_idx = np.minimum((days_since - 1) // PERIOD_DAYS, LAST_PERIOD)
+    return age, days_since, spread_year, period_idx
@@ -0,0 +1,161 @@
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import http_client, integrations
+
+logger = logging.getLogger(__name__)
+
+# ====================== LOB DISPATCHER ======================
+# Uploads letters concurrently while staying under Lob's rate limit. Every request takes a
+# token from a shared bucket refilled at LOB_RATE_LIMIT per second. Lob's X-Rate-Limit-*
+# headers and 429 Retry-After drain the bucket until the window resets, so the dispatcher
+# slows to whatever rate Lob actually allows. 429s and 5xx are retried here (the HTTP session
+# only retries connection errors), so every attempt takes a token. Outcomes are queued as MailResult records for the
+# caller to drain on its own thread, e.g. into the batch journal.
+
+LOB_RATE_LIMIT = float(os.getenv("LOB_RATE_LIMIT", 25))   # requests per second (Lob: 150 per 5s)
+LOB_CONCURRENCY = int(os.getenv("LOB_CONCURRENCY", 8))
+
+MailResult = collections.namedtuple("MailResult", "key lob_id status error seconds attempts context")
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds every request for `seconds` (rate limit exhausted) and empties the bucket."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+def _header_float(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _error_message(response):
+    """Lob's error message, or the start of the body when it is not Lob JSON (e.g. a proxy's 502 page)."""
+    try:
+        return response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text[:200] or None
+
+class LobDispatcher:
+    def __init__(self, rate=LOB_RATE_LIMIT, concurrency=LOB_CONCURRENCY, retries=3, max_pending=None):
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        # The session retries connection errors only; 429/5xx go back through the bucket in _send
+        self.session = http_client.make_session(retry_methods=("POST",), retry_statuses=(), pool_size=concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="lob-dispatch")
+        self._slots = threading.BoundedSemaphore(max_pending or concurrency * 8)
+        self._results = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "failed": 0, "throttled": 0}
+
+    def submit(self, key, pdf, address, context=None):
+        """Queues one letter; blocks while max_pending letters are already waiting.
+
+        key doubles as the Idempotency-Key, so a letter retried (here or in a later run) is
+        created once. context is handed back untouched on the MailResult.
+        """
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        self._pool.submit(self._send, key, pdf, address, context)
+
+    def _send(self, key, pdf, address, context):
+        started = time.perf_counter()
+        attempt = 0
+        if not os.getenv("LOB_API_KEY"):
+            return self._finish(key, None, "Lob mocked", started, attempt, context)
+        try:
+            while True:
+                attempt += 1
+                self.bucket.acquire()
+                try:
+                    response = integrations.create_lob_letter(pdf, address, idempotency_key=key, session=self.session)
+                except Exception as e:
+                    if attempt > self.retries:
+                        return self._finish(key, None, f"{type(e).__name__}: {e}", started, attempt, context)
+                    time.sleep(min(2 ** attempt, 30) * http_client.BACKOFF)
+                    continue
+                self._adapt(response)
+                if response.status_code == 200:
+                    return self._finish(key, response.json().get("id"), None, started, attempt, context)
+                if response.status_code == 429 or response.status_code >= 500:
+                    if attempt <= self.retries:
+                        if response.status_code >= 500:
+                            time.sleep(min(2 ** attempt, 30) * http_client.BACKOFF)
+                        continue
+                return self._finish(key, None, f"Lob {response.status_code}: {_error_message(response)}",
+                                    started, attempt, context)
+        except BaseException as e:
+            self._finish(key, None, f"{type(e).__name__}: {e}", started, attempt, context)
+            raise
+
+    def _adapt(self, response):
+        headers = response.headers
+        if response.status_code == 429:
+            self.stats["throttled"] += 1
+            retry_after = _header_float(headers, "Retry-After")
+            self.bucket.pause(retry_after if retry_after is not None else 1.0)
+            return
+        remaining = _header_float(headers, "X-Rate-Limit-Remaining")
+        reset = _header_float(headers, "X-Rate-Limit-Reset")
+        if remaining is not None and remaining < 1 and reset is not None:
+            self.bucket.pause(max(0.0, reset - time.time()))
+
+    def _finish(self, key, lob_id, error, started, attempts, context):
+        status = "failed" if error else "mailed"
+        self._results.put(MailResult(key, lob_id, status, error, time.perf_counter() - started, attempts, context))
+        with self._lock:
+            self.stats["failed" if error else "sent"] += 1
+            self._pending -= 1
+        self._slots.release()
+
+    def results(self, wait=False):
+        """Yields finished MailResults; with wait=True, until every submitted letter is done."""
+        while True:
+            try:
+                yield self._results.get(block=wait and self.pending > 0, timeout=0.5 if wait else None)
+            except queue.Empty:
+                if not wait or self.pending == 0:
+                    return
+
+    @property
+    def pending(self):
+        with self._lock:
+            return self._pending
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.session.close()
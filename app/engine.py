@@ -1,9 +1,37 @@
 import datetime
+import hashlib
+import logging
 import math
+import mmap
+import numbers
+import os
+from array import array
+
+import numpy as np
+
+from . import dates
+
+logger = logging.getLogger(__name__)
 
 # ====================== DATA CONSTANTS ======================
+# Cards are handled internally as IDs in solar value order: ID = sv - 1 (A♥ = 0 ... K♠ = 51).
+# Strings are only produced at the API boundary.
+SUITS = ['♥','♣','♦','♠']
+RANKS = ['A','2','3','4','5','6','7','8','9','10','J','Q','K']
+CARDS = tuple(f"{rank}{suit}" for suit in SUITS for rank in RANKS)
+CARD_IDS = {card: card_id for card_id, card in enumerate(CARDS)}
+NO_CARD = -1
+
+def card_ids(cards):
+    """Encodes card strings as a compact array of card IDs."""
+    return array('b', (CARD_IDS[card] for card in cards))
+
+def card_name(card_id: int):
+    """Display name for a card ID ('10♥'), or None for NO_CARD."""
+    return CARDS[card_id] if card_id != NO_CARD else None
+
 # Standard "Life Spread" (Year 0)
-YEAR_0 = [
+YEAR_0 = card_ids([
     '7♥','6♥','5♥','4♥','3♥','2♥','A♥',  # Row 0: Mercury (Indices 0-6)
     'A♣','K♥','Q♥','J♥','10♥','9♥','8♥', # Row 1: Venus
     '8♣','7♣','6♣','5♣','4♣','3♣','2♣',  # Row 2: Mars
@@ -12,10 +40,10 @@ YEAR_0 = [
     '3♠','2♠','A♠','K♦','Q♦','J♦','10♦', # Row 5: Uranus
     '10♠','9♠','8♠','7♠','6♠','5♠','4♠', # Row 6: Neptune
     'K♠','Q♠','J♠'                       # Crown (Indices 49-51)
-]
+])
 
 # Quadration Permutation (Standard 52-card shuffle)
-P = [
+P = array('b', [
     37,34,17,42,24,7,4,   # 0-6
     5,43,27,10,47,30,0,   # 7-13
     14,51,21,18,1,38,8,   # 14-20
@@ -24,10 +52,99 @@ P = [
     40,23,20,45,28,25,50, # 35-41
     9,46,16,13,36,33,3,   # 42-48
     49,29,26              # 49-51 (Crown)
-]
+])
 
 ROWS = ['Mercury','Venus','Mars','Jupiter','Saturn','Uranus','Neptune']
-NO_DISP_ENV = {'K♠', 'J♥', '8♣', 'A♣', '2♥', '7♦', '9♥'}
+NO_DISP_ENV = frozenset(card_ids(['K♠', 'J♥', '8♣', 'A♣', '2♥', '7♦', '9♥']))
+
+CROWN_START = 49       # Flat slots 49-51 hold the crown
+MAX_SPREAD_YEAR = dates.MAX_SPREAD_YEAR  # Spread years are clamped to 1..90
+SPREAD_CYCLE = 90      # Order of P: shuffling 90 times returns to the Life Spread
+
+# ====================== SPREAD STORE ======================
+
+def _permutation_powers(perm, count):
+    """Returns [perm^0, perm^1, ... perm^(count-1)] as index lists, built from the cycles of perm."""
+    size = len(perm)
+    powers = [[0] * size for _ in range(count)]
+    seen = [False] * size
+    for start in range(size):
+        if seen[start]:
+            continue
+        cycle = []
+        slot = start
+        while not seen[slot]:
+            seen[slot] = True
+            cycle.append(slot)
+            slot = perm[slot]
+        # Along a cycle, perm^n(cycle[k]) is simply cycle[k + n] (wrapping).
+        length = len(cycle)
+        for k, slot in enumerate(cycle):
+            for n in range(count):
+                powers[n][slot] = cycle[(k + n) % length]
+    return powers
+
+def _build_spread_store():
+    """Builds every yearly spread (0-90) once, plus a card ID -> flat slot index per spread."""
+    spreads = tuple(
+        array('b', (YEAR_0[i] for i in power))
+        for power in _permutation_powers(P, MAX_SPREAD_YEAR + 1)
+    )
+    positions = []
+    for flat in spreads:
+        position = array('b', bytes(len(flat)))
+        for slot, card_id in enumerate(flat):
+            position[card_id] = slot
+        positions.append(position)
+    return spreads, tuple(positions)
+
+# SPREADS[n] is YEAR_0 shuffled n times; SPREAD_POSITIONS[n][card_id] is that card's flat slot.
+SPREADS, SPREAD_POSITIONS = _build_spread_store()
+
+def _spread_index(spread_year: int):
+    """Maps any shuffle count onto the stored spreads (P repeats every 90 shuffles)."""
+    if spread_year <= 0:
+        return 0
+    if spread_year <= MAX_SPREAD_YEAR:
+        return spread_year
+    return spread_year % SPREAD_CYCLE
+
+def get_spread(spread_year: int):
+    """Returns the flat 52-card spread (grid rows then crown) for a spread year, as card IDs."""
+    return SPREADS[_spread_index(spread_year)]
+
+def find_card(spread_year: int, card_id: int):
+    """Returns the flat slot of a card ID in a spread year."""
+    if not 0 <= card_id < len(CARDS):
+        raise ValueError(f"{card_id!r} is not a card ID")
+    return SPREAD_POSITIONS[_spread_index(spread_year)][card_id]
+
+def slot_location(slot: int):
+    """Maps a flat slot to (row, col, crown_idx); row/col are None for crown slots."""
+    if slot >= CROWN_START:
+        return None, None, slot - CROWN_START
+    row, col = divmod(slot, 7)
+    return row, col, None
+
+# Chain traversal order over flat slots: each row right to left (col 6 -> 0), rows top
+# to bottom, then crown 2 -> 1 -> 0, then wrapping back to Mercury col 6.
+TRAVERSAL_ORDER = tuple(r * 7 + c for r in range(7) for c in range(6, -1, -1)) + (51, 50, 49)
+TRAVERSAL_POSITION = tuple(TRAVERSAL_ORDER.index(slot) for slot in range(52))
+
+# Each spread laid out in traversal order and repeated three times, so any chain of up to
+# 104 cards starting after any anchor is a single slice.
+_LINEAR_REPEATS = 3
+LINEAR_SPREADS = tuple(
+    array('b', (flat[slot] for slot in TRAVERSAL_ORDER)) * _LINEAR_REPEATS for flat in SPREADS
+)
+# Each spread as card names in slot order, to recognise grids built from the store
+SPREAD_NAMES = tuple(tuple(CARDS[card_id] for card_id in flat) for flat in SPREADS)
+
+def _card_at(grid, crown, slot):
+    row, col, cidx = slot_location(slot)
+    if cidx is not None:
+        return crown[cidx]
+    return grid[ROWS[row]][col]
 
 # ====================== CORE LOGIC ======================
 
@@ -35,35 +152,22 @@ def get_birth_card(month: int, day: int):
     """Calculates birth card from month/day using Solar Value."""
     sv = 55 - (month * 2 + day)
     if sv <= 0: return "Joker", 0
-    suits = ['♥','♣','♦','♠']
-    ranks = ['A','2','3','4','5','6','7','8','9','10','J','Q','K']
     # sv 1 = A♥, sv 52 = K♠
-    return f"{ranks[(sv-1)%13]}{suits[(sv-1)//13]}", sv
+    return CARDS[sv - 1], sv
 
 def get_spread_year(birth_month: int, birth_day: int, birth_year: int, target_date: datetime.date):
-    """Calculates the Spread Year (Age + 1) and day of year."""
-    try:
-        last_bday = datetime.date(target_date.year, birth_month, birth_day)
-    except ValueError: # Leap year case (Feb 29)
-        last_bday = datetime.date(target_date.year, 3, 1) # Treat as Mar 1 for non-leap years
+    """Calculates the Spread Year (Age + 1) and day of year.
 
-    if last_bday > target_date:
-        try:
-            last_bday = datetime.date(target_date.year - 1, birth_month, birth_day)
-        except ValueError:
-            last_bday = datetime.date(target_date.year - 1, 3, 1)
-
-    age = last_bday.year - birth_year
-    days_since = (target_date - last_bday).days + 1
-    spread_year = min(max(age + 1, 1), 90)
-    return age, days_since, spread_year, last_bday
+    A Feb 29 birthday counts as Mar 1 in non-leap years (see app.dates).
+    """
+    age, days_since, spread_year, _, last_bday = dates.spread_position(
+        birth_year, birth_month, birth_day, target_date.year, target_date.toordinal()
+    )
+    return age, days_since, spread_year, datetime.date.fromordinal(last_bday)
 
 def generate_yearly_spread_data(spread_year: int):
     """Generates the grid and crown for a specific spread year."""
-    # Start with Year 0
-    flat = YEAR_0[:]
-    
-    # Shuffle N times
+    # Spreads come precomputed from the store (YEAR_0 shuffled N times)
     # Note: spread_year 0 = Life Spread. spread_year 1 = First shuffle.
     # The spec implies `data[str(spread_year)]` where 0 is base.
     # If spread_year is 1 (Age 0), is it Year 0 or Year 1?
@@ -76,9 +180,8 @@ def generate_yearly_spread_data(spread_year: int):
     # This implies there IS a spread for Year 36.
     # I will assume we shuffle `spread_year` times from Year 0.
     
-    for _ in range(spread_year):
-        flat = [flat[i] for i in P]
-        
+    flat = [CARDS[card_id] for card_id in get_spread(spread_year)]
+
     # Map to Grid and Crown
     # Grid: 7 rows of 7 (indices 0-48)
     grid = {}
@@ -117,178 +220,260 @@ def generate_yearly_spread_data(spread_year: int):
     # YEAR_0: K♠(49), Q♠(50), J♠(51).
     # Usually K♠ is Saturn(0)? Q♠ Jupiter? J♠ Mars?
     # Let's assume order is preserved: crown[0] = flat[49].
-    crown = flat[49:52]
+    crown = flat[CROWN_START:52]
     
     return grid, crown
 
+def _anchor_position(spread_year, card_id):
+    return TRAVERSAL_POSITION[find_card(spread_year, card_id)]
+
+def get_chain(spread_year: int, card_id: int, count: int):
+    """Returns the first `count` card IDs of the chain left of a card in a spread year."""
+    linear = LINEAR_SPREADS[_spread_index(spread_year)]
+    start = _anchor_position(spread_year, card_id) + 1
+    if start + count <= len(linear):
+        return linear[start:start + count].tolist()
+    return [linear[(start + i) % 52] for i in range(count)]
+
+def chain_card(spread_year: int, card_id: int, n: int):
+    """Returns the n-th (0-based) chain card ID without building the chain."""
+    linear = LINEAR_SPREADS[_spread_index(spread_year)]
+    return linear[(_anchor_position(spread_year, card_id) + 1 + n) % 52]
+
+def get_chain_cards(spread_year: int, card_id: int, period_idx: int):
+    """Returns only the chain card IDs a letter uses: (period, long_range, pluto, result).
+
+    Pluto/Result are NO_CARD on short chains. Matches indexing into
+    extract_chain(..., spread_year): a period past the end of the chain raises IndexError.
+    """
+    if not 0 <= period_idx < spread_year:
+        raise IndexError("chain index out of range")
+    linear = LINEAR_SPREADS[_spread_index(spread_year)]
+    start = _anchor_position(spread_year, card_id) + 1
+    period_card = linear[(start + period_idx) % 52]
+    long_range = linear[(start + spread_year - 1) % 52] # Last card extracted
+    pluto = linear[(start + 7) % 52] if spread_year >= 8 else NO_CARD
+    result = linear[(start + 8) % 52] if spread_year >= 9 else NO_CARD
+    return period_card, long_range, pluto, result
+
 def extract_chain(grid, crown, birth_card, spread_year):
-    """Extracts the planetary period chain."""
-    r = c = None
-    in_crown_anchor = False
-    anchor_cidx = None
+    """Extracts the planetary period chain.
+
+    The chain is spread_year cards in traversal order, starting immediately left of the
+    anchor. When grid/crown are the stored spread for spread_year (as
+    generate_yearly_spread_data builds them) it is a slice of the store; any other
+    grid/crown is walked directly.
+    """
+    if _is_stored_spread(grid, crown, spread_year):
+        return [CARDS[card_id] for card_id in get_chain(spread_year, CARD_IDS[birth_card], spread_year)]
+
+    slot = _locate(grid, crown, birth_card)
+    if slot is None:
+        raise ValueError(f"{birth_card!r} is not in the spread")
+    start = TRAVERSAL_POSITION[slot] + 1
+    return [_card_at(grid, crown, TRAVERSAL_ORDER[(start + i) % 52]) for i in range(spread_year)]
 
-    # Find Anchor
+def _is_stored_spread(grid, crown, spread_year):
+    names = SPREAD_NAMES[_spread_index(spread_year)]
+    if tuple(crown) != names[CROWN_START:]:
+        return False
+    return all(tuple(grid[rn]) == names[ri * 7:ri * 7 + 7] for ri, rn in enumerate(ROWS))
+
+def _locate(grid, crown, card):
+    """Finds a card's flat slot by scanning a grid and crown (for spreads not taken from the store)."""
     for ri, rn in enumerate(ROWS):
-        if birth_card in grid[rn]:
-            r = ri
-            c = grid[rn].index(birth_card)
-            break
-            
-    if r is None:
-        if birth_card in crown:
-            in_crown_anchor = True
-            anchor_cidx = crown.index(birth_card)
-
-    results = []
-    in_crown = in_crown_anchor
-    
-    # State variables for traversal
-    curr_r, curr_c = r, c
-    curr_cidx = anchor_cidx
+        if card in grid[rn]:
+            return ri * 7 + grid[rn].index(card)
+    if card in crown:
+        return CROWN_START + crown.index(card)
+    return None
+
+def get_displacement_environment(life_grid, life_crown, yearly_grid, yearly_crown, birth_card, spread_year=None):
+    """Returns (displacement, environment) for a birth card.
+
+    When spread_year is given the birth card is located through the store's position
+    index instead of scanning the grids.
+    """
+    if spread_year is not None:
+        return tuple(map(card_name, displacement_environment(spread_year, CARD_IDS[birth_card])))
+
+    yearly_slot = _locate(yearly_grid, yearly_crown, birth_card)
+    life_slot = _locate(life_grid, life_crown, birth_card)
 
-    # Logic from spec
-    # "Starting immediately left of the anchor"
-    # We simulate steps.
-    
-    # Helper to move one step left
-    def move_step(loc_in_crown, loc_r, loc_c, loc_cidx):
-        if loc_in_crown:
-            if loc_cidx > 0:
-                return True, None, None, loc_cidx - 1 # Stay in crown, move left
-            else:
-                return False, 0, 6, None # Exit crown to Merc(0) Col 6
-        else:
-            if loc_c > 0:
-                return False, loc_r, loc_c - 1, None # Grid move left
-            elif loc_r < 6:
-                return False, loc_r + 1, 6, None # Grid drop row, reset to right
-            else:
-                return True, None, None, 2 # Enter crown at index 2 (Mars)
-
-    # Initial move (Start immediately left)
-    in_crown, curr_r, curr_c, curr_cidx = move_step(in_crown, curr_r, curr_c, curr_cidx)
-
-    while len(results) < spread_year:
-        # Collect card at current position
-        if in_crown:
-            results.append(crown[curr_cidx])
-        else:
-            results.append(grid[ROWS[curr_r]][curr_c])
-            
-        # Move to next for next iteration? 
-        # Wait, loop condition is len < spread_year.
-        # We collect, THEN move? Or Move THEN collect?
-        # Spec: "Starting immediately left... collect cards... extract spread_year cards total"
-        # So we collect the one we just moved to.
-        # Then we need to move AGAIN for the next one?
-        # Yes.
-        if len(results) < spread_year:
-             in_crown, curr_r, curr_c, curr_cidx = move_step(in_crown, curr_r, curr_c, curr_cidx)
-
-    return results
-
-def get_displacement_environment(life_grid, life_crown, yearly_grid, yearly_crown, birth_card):
     # Displacement: Year 0 card at birth card's current position
-    disp = None
-    env = None
-    
-    # Find current position of birth card
-    curr_r = curr_c = curr_cidx = None
-    is_crown = False
-    
-    for ri, rn in enumerate(ROWS):
-        if birth_card in yearly_grid[rn]:
-            curr_r = ri
-            curr_c = yearly_grid[rn].index(birth_card)
-            break
-    if curr_r is None:
-        if birth_card in yearly_crown:
-            is_crown = True
-            curr_cidx = yearly_crown.index(birth_card)
-            
-    if is_crown:
-        disp = life_crown[curr_cidx]
-    elif curr_r is not None:
-        disp = life_grid[ROWS[curr_r]][curr_c]
-        
+    disp = _card_at(life_grid, life_crown, yearly_slot) if yearly_slot is not None else None
+
     # Environment: Yearly card at birth card's Year 0 position
-    # Find Year 0 position
-    y0_r = y0_c = y0_cidx = None
-    y0_is_crown = False
-    
-    for ri, rn in enumerate(ROWS):
-        if birth_card in life_grid[rn]:
-            y0_r = ri
-            y0_c = life_grid[rn].index(birth_card)
-            break
-    if y0_r is None:
-        if birth_card in life_crown:
-            y0_is_crown = True
-            y0_cidx = life_crown.index(birth_card)
-            
-    if y0_is_crown:
-        env = yearly_crown[y0_cidx]
-    elif y0_r is not None:
-        env = yearly_grid[ROWS[y0_r]][y0_c]
-        
+    env = _card_at(yearly_grid, yearly_crown, life_slot) if life_slot is not None else None
+
     return disp, env
 
+def displacement_environment(spread_year: int, card_id: int):
+    """Returns (displacement, environment) card IDs straight from the stored spreads."""
+    yearly_slot = find_card(spread_year, card_id)
+    life_slot = find_card(0, card_id)
+    return get_spread(0)[yearly_slot], get_spread(spread_year)[life_slot]
+
 # ====================== INTERPRETATION HELPERS ======================
 
-def get_suit_realm(card: str):
+ARCHETYPES = {
+    'A':'Pioneer','2':'Partner','3':'Creator','4':'Builder','5':'Disruptor',
+    '6':'Server','7':'Seeker','8':'Commander','9':'Completer','10':'Master',
+    'J':'Messenger','Q':'Sovereign','K':'Authority'
+}
+REALMS = {'♥':'Emotional','♣':'Behavioral','♦':'Material','♠':'Intellectual'}
+
+# Per-card lookups indexed by card ID
+CARD_ARCHETYPES = tuple(ARCHETYPES[rank] for suit in SUITS for rank in RANKS)
+CARD_REALMS = tuple(REALMS[suit] for suit in SUITS for rank in RANKS)
+
+_STRIP_SUITS = str.maketrans('', '', ''.join(SUITS))
+
+def get_suit_realm(card):
+    """Realm for a card ID (any integer, including NumPy's) or card string."""
+    if isinstance(card, numbers.Integral): return CARD_REALMS[card]
     if not card: return "Unknown"
+    card_id = CARD_IDS.get(card)
+    if card_id is not None: return CARD_REALMS[card_id]
     if '♥' in card: return "Emotional"
     if '♣' in card: return "Behavioral"
     if '♦' in card: return "Material"
     return "Intellectual"
 
-def get_rank_archetype(card: str):
+def get_rank_archetype(card):
+    """Archetype for a card ID (any integer, including NumPy's) or card string."""
+    if isinstance(card, numbers.Integral): return CARD_ARCHETYPES[card]
     if not card: return "Unknown"
-    r = card.replace('♥','').replace('♣','').replace('♦','').replace('♠','')
-    arch = {
-        'A':'Pioneer','2':'Partner','3':'Creator','4':'Builder','5':'Disruptor',
-        '6':'Server','7':'Seeker','8':'Commander','9':'Completer','10':'Master',
-        'J':'Messenger','Q':'Sovereign','K':'Authority'
-    }
-    return arch.get(r, r)
+    card_id = CARD_IDS.get(card)
+    if card_id is not None: return CARD_ARCHETYPES[card_id]
+    r = card.translate(_STRIP_SUITS)
+    return ARCHETYPES.get(r, r)
+
+# ====================== READING TABLE ======================
+# A reading depends only on (birth card, spread year, period index), so every answer fits in a
+# small fixed-width file: one record per (birth card ID, spread year 0-90) holding
+# [long_range, pluto, result, displacement, environment, period_0 .. period_6] as card IDs
+# (0xFF = no card). The file is mmap'd read-only, so every worker shares the same pages.
+
+READING_TABLE_PATH = os.getenv(
+    "READING_TABLE_PATH", os.path.join(os.path.dirname(__file__), "readings.bin")
+)
+_TABLE_MAGIC = b"AAREADv1"
+_TABLE_RECORD_SIZE = 12
+_TABLE_NONE = 0xFF
+_TABLE_HEADER_SIZE = len(_TABLE_MAGIC) + 32
+_TABLE_IDS = tuple(range(len(CARDS))) + (NO_CARD,) * (256 - len(CARDS))  # byte -> card ID
+
+def _table_fingerprint():
+    """Hash of everything the table is derived from; a stale file is rebuilt instead of read."""
+    source = repr((YEAR_0, P, sorted(NO_DISP_ENV), MAX_SPREAD_YEAR, _TABLE_RECORD_SIZE))
+    return hashlib.sha256(source.encode("utf-8")).digest()
+
+def _table_record(card_id, spread_year):
+    if spread_year == 0:
+        return bytes([_TABLE_NONE]) * _TABLE_RECORD_SIZE
+    chain = get_chain(spread_year, card_id, spread_year)
+    _, long_range, pluto, result = get_chain_cards(spread_year, card_id, 0)
+    disp, env = displacement_environment(spread_year, card_id)
+    if card_id in NO_DISP_ENV:
+        disp = env = NO_CARD
+    periods = [chain[i] if i < spread_year else NO_CARD for i in range(7)]
+    return bytes(c & 0xFF for c in [long_range, pluto, result, disp, env] + periods)
+
+def build_reading_table(path=None):
+    """Writes the reading table to path (atomically) and returns the path."""
+    path = path or READING_TABLE_PATH
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_TABLE_MAGIC + _table_fingerprint())
+        for card_id in range(len(CARDS)):
+            for spread_year in range(MAX_SPREAD_YEAR + 1):
+                f.write(_table_record(card_id, spread_year))
+    os.replace(tmp_path, path)
+    return path
+
+def load_reading_table(path=None):
+    """Maps the reading table read-only, building it first if it is missing or stale."""
+    path = path or READING_TABLE_PATH
+    expected_header = _TABLE_MAGIC + _table_fingerprint()
+    expected_size = _TABLE_HEADER_SIZE + len(CARDS) * (MAX_SPREAD_YEAR + 1) * _TABLE_RECORD_SIZE
+    for attempt in range(2):
+        try:
+            with open(path, "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if table[:_TABLE_HEADER_SIZE] == expected_header and len(table) == expected_size:
+                return table
+            table.close()
+            logger.warning(f"Reading table {path} is stale; rebuilding.")
+        except (FileNotFoundError, ValueError):
+            pass
+        build_reading_table(path)
+    raise RuntimeError(f"Could not load reading table from {path}")
+
+_reading_table = None  # None: not loaded yet; False: unavailable, readings come from the spreads
+
+def get_reading_table():
+    """Returns the shared mmap'd reading table, or None if READING_TABLE_PATH is set empty or
+    the table could not be loaded or built (tried once per process, then spreads are used)."""
+    global _reading_table
+    if _reading_table is None and READING_TABLE_PATH:
+        try:
+            _reading_table = load_reading_table()
+        except (OSError, RuntimeError) as e:
+            logger.error(f"Reading table unavailable, computing readings from spreads: {e}")
+            _reading_table = False
+    return _reading_table if _reading_table is not False else None
+
+def reading_table_array():
+    """The reading table as a zero-copy NumPy view shaped [card ID, spread year, field]."""
+    table = get_reading_table()
+    if table is None:
+        return None
+    return np.frombuffer(table, dtype=np.uint8, offset=_TABLE_HEADER_SIZE).reshape(
+        len(CARDS), MAX_SPREAD_YEAR + 1, _TABLE_RECORD_SIZE
+    )
+
+def _read_reading(card_id, spread_year, period_idx):
+    """Looks up (period, long_range, pluto, result, displacement, environment) IDs with one read."""
+    table = get_reading_table()
+    if table is None:
+        return None
+    offset = _TABLE_HEADER_SIZE + (card_id * (MAX_SPREAD_YEAR + 1) + spread_year) * _TABLE_RECORD_SIZE
+    record = table[offset:offset + _TABLE_RECORD_SIZE]
+    period_card = _TABLE_IDS[record[5 + period_idx]]
+    if period_card == NO_CARD:
+        raise IndexError("list index out of range")
+    return (period_card,) + tuple(_TABLE_IDS[b] for b in record[:5])
 
 # ====================== API ENTRY POINT ======================
 
 def calculate_letter_data(first_name, birth_year, birth_month, birth_day, target_date_str="2026-03-15"):
-    target_date = datetime.datetime.strptime(target_date_str, "%Y-%m-%d").date()
-    
+    target_year, target_ordinal = dates.target_day(target_date_str)
+
     # 1. Birth Card
     bc, sv = get_birth_card(birth_month, birth_day)
     if bc == "Joker":
         return {"error": "Joker cannot receive a spread."}
         
-    # 2. Spread Year
-    age, days_since, spread_year, last_bday = get_spread_year(birth_month, birth_day, birth_year, target_date)
-    
-    # 3. Load Spreads (Life and Current)
-    life_grid, life_crown = generate_yearly_spread_data(0)
-    yearly_grid, yearly_crown = generate_yearly_spread_data(spread_year)
-    
-    # 4. Extract Chain
-    chain = extract_chain(yearly_grid, yearly_crown, bc, spread_year)
-    
-    # 5. Assign Cards
-    # Active period
+    # 2. Spread Year and active period
     # Days 1-52: Mercury (idx 0), 53-104: Venus (idx 1)...
-    # Use days_since to find index
-    period_idx = min((days_since - 1) // 52, 6)
-    period_card = chain[period_idx]
+    age, days_since, spread_year, period_idx, _ = dates.spread_position(
+        birth_year, birth_month, birth_day, target_year, target_ordinal
+    )
+
+    # 3. Chain picks (Active period + Year Long)
     planet = ROWS[period_idx]
-    
-    # Year Long
-    long_range = chain[spread_year - 1] # Last card extracted
-    pluto = chain[7] if spread_year >= 8 else None
-    result = chain[8] if spread_year >= 9 else None
-    
-    # Disp/Env
-    disp, env = get_displacement_environment(life_grid, life_crown, yearly_grid, yearly_crown, bc)
-    if bc in NO_DISP_ENV:
-        disp = env = None
+    card_id = sv - 1
+    reading = _read_reading(card_id, spread_year, period_idx)
+    if reading is not None:
+        period_card, long_range, pluto, result, disp, env = reading
+    else:
+        period_card, long_range, pluto, result = get_chain_cards(spread_year, card_id, period_idx)
+
+        # 4. Disp/Env
+        disp, env = displacement_environment(spread_year, card_id)
+        if card_id in NO_DISP_ENV:
+            disp = env = NO_CARD
         
     return {
         "subscriber": first_name,
@@ -296,20 +481,124 @@ def calculate_letter_data(first_name, birth_year, birth_month, birth_day, target
         "age": age,
         "spread_year": spread_year,
         "period": {
-            "card": period_card,
+            "card": card_name(period_card),
             "planet": planet,
             "days_since": days_since
         },
         "year_long": {
-            "long_range": long_range,
-            "pluto": pluto,
-            "result": result,
-            "displacement": disp,
-            "environment": env
+            "long_range": card_name(long_range),
+            "pluto": card_name(pluto),
+            "result": card_name(result),
+            "displacement": card_name(disp),
+            "environment": card_name(env)
+        }
+    }
+
+# ====================== BATCH API ======================
+
+# Integer views of the spread store: [spread_year, slot] -> card ID, [spread_year, card ID] -> slot,
+# and [spread_year, traversal position] -> card ID.
+SPREAD_IDS = np.array(SPREADS, dtype=np.int8)
+POSITION_IDS = np.array(SPREAD_POSITIONS, dtype=np.int8)
+LINEAR_IDS = SPREAD_IDS[:, list(TRAVERSAL_ORDER)]
+_TRAVERSAL_POSITION_IDS = np.array(TRAVERSAL_POSITION, dtype=np.int64)
+_NO_DISP_ENV_MASK = np.isin(np.arange(len(CARDS)), list(NO_DISP_ENV))
+
+BATCH_FIELDS = (
+    "birth_card", "age", "spread_year", "days_since", "period_index", "period_card",
+    "long_range", "pluto", "result", "displacement", "environment",
+)
+
+def calculate_letter_data_batch(birth_years, birth_months, birth_days, target_dates="2026-03-15"):
+    """Vectorized calculate_letter_data over arrays of birth dates.
+
+    target_dates is one date (ISO string or datetime.date) or an array of them, one per row.
+    Returns a columnar dict of NumPy arrays keyed by BATCH_FIELDS. Cards are card IDs
+    (index into CARDS); NO_CARD marks a missing card: every card for Joker rows, Pluto/Result
+    on short chains, displacement/environment for NO_DISP_ENV, and the period card where the
+    scalar path would raise IndexError (the period falls past the end of the chain).
+    """
+    months = np.asarray(birth_months, dtype=np.int64)
+    days = np.asarray(birth_days, dtype=np.int64)
+
+    # 1. Birth Card (Joker rows are masked out at the end)
+    sv = 55 - (months * 2 + days)
+    joker = sv <= 0
+    bc = np.where(joker, 0, sv - 1)
+
+    # 2. Spread Year and active period
+    age, days_since, spread_year, period_idx = dates.spread_positions(
+        birth_years, months, days, target_dates
+    )
+
+    table = reading_table_array()
+    if table is not None:
+        records = table[bc, spread_year].astype(np.int16)
+        records[records == _TABLE_NONE] = NO_CARD
+        long_range, pluto, result, displacement, environment = records[:, :5].T
+        period_card = np.take_along_axis(records, (5 + period_idx)[:, None], axis=1)[:, 0]
+        return _batch_columns(joker, bc, age, spread_year, days_since, period_idx, period_card,
+                              long_range, pluto, result, displacement, environment)
+
+    # 3. Chain picks
+    start = _TRAVERSAL_POSITION_IDS[POSITION_IDS[spread_year, bc]] + 1
+    row_base = spread_year * 52
+    linear = LINEAR_IDS.ravel()
+    def pick(offset):
+        return linear[row_base + (start + offset) % 52]
+    period_card = np.where(period_idx < spread_year, pick(period_idx), NO_CARD)
+    long_range = pick(spread_year - 1)
+    pluto = np.where(spread_year >= 8, pick(7), NO_CARD)
+    result = np.where(spread_year >= 9, pick(8), NO_CARD)
+
+    # 4. Disp/Env
+    no_disp_env = _NO_DISP_ENV_MASK[bc]
+    displacement = np.where(no_disp_env, NO_CARD, SPREAD_IDS[0, POSITION_IDS[spread_year, bc]])
+    environment = np.where(no_disp_env, NO_CARD, SPREAD_IDS[spread_year, POSITION_IDS[0, bc]])
+
+    return _batch_columns(joker, bc, age, spread_year, days_since, period_idx, period_card,
+                          long_range, pluto, result, displacement, environment)
+
+def _batch_columns(joker, *values):
+    columns = dict(zip(BATCH_FIELDS, values))
+    for name in ("birth_card", "period_card", "long_range", "pluto", "result", "displacement", "environment"):
+        columns[name] = np.where(joker, NO_CARD, columns[name]).astype(np.int8)
+    return columns
+
+def letter_data_from_batch(batch, i, first_name):
+    """Rebuilds the calculate_letter_data dict for row i of a calculate_letter_data_batch result."""
+    def card(name):
+        return card_name(int(batch[name][i]))
+
+    if batch["birth_card"][i] == NO_CARD:
+        return {"error": "Joker cannot receive a spread."}
+    if batch["period_card"][i] == NO_CARD:
+        raise IndexError("list index out of range")
+    return {
+        "subscriber": first_name,
+        "birth_card": card("birth_card"),
+        "age": int(batch["age"][i]),
+        "spread_year": int(batch["spread_year"][i]),
+        "period": {
+            "card": card("period_card"),
+            "planet": ROWS[int(batch["period_index"][i])],
+            "days_since": int(batch["days_since"][i])
+        },
+        "year_long": {
+            "long_range": card("long_range"),
+            "pluto": card("pluto"),
+            "result": card("result"),
+            "displacement": card("displacement"),
+            "environment": card("environment")
         }
     }
 
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:2] == ["--build-table"]:
+        print("Wrote", build_reading_table(sys.argv[2] if len(sys.argv) > 2 else None))
+        sys.exit(0)
+
     # Test Case 1: 8♦ (Feb 17 1991), effective Feb 21 2026
     # Expect: Spread Year 36. Period 7♦ (Mercury). LR 4♦. Pluto 3♦. Result K♦. Disp 6♦. Env 8♠.
     data = calculate_letter_data("Cassidy", 1991, 2, 17, "2026-02-21")
@@ -0,0 +1,58 @@
+import functools
+import os
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ====================== SHARED HTTP CLIENTS ======================
+# One requests.Session per upstream service and process: keep-alive connections are pooled
+# (HTTP_POOL_SIZE per host) so TLS setup is paid once per process rather than once per
+# letter. Every call has a (connect, read) timeout, and 429/5xx responses and dropped
+# connections are retried with exponential backoff plus full jitter, honouring Retry-After.
+# POSTs are only retried on the Lob session, whose letter creation carries an
+# Idempotency-Key so a retried upload can never mail twice.
+
+LOB_API_BASE = os.getenv("LOB_API_BASE", "https://api.lob.com/v1")
+TIKTOK_API_BASE = os.getenv("TIKTOK_API_BASE", "https://open-api.tiktokglobalshop.com")
+
+TIMEOUT = (float(os.getenv("HTTP_CONNECT_TIMEOUT", 5)), float(os.getenv("HTTP_READ_TIMEOUT", 30)))
+RETRIES = int(os.getenv("HTTP_RETRIES", 4))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 20))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with full jitter: sleeps a random time up to the exponential backoff."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+def make_session(retry_methods=("GET", "HEAD"), retries=RETRIES, pool_size=POOL_SIZE, retry_statuses=RETRY_STATUSES):
+    retry = JitteredRetry(
+        total=retries,
+        backoff_factor=BACKOFF,
+        status_forcelist=retry_statuses,
+        allowed_methods=frozenset(retry_methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+@functools.lru_cache(maxsize=None)
+def lob_session():
+    return make_session(retry_methods=("GET", "POST", "DELETE"))
+
+@functools.lru_cache(maxsize=None)
+def tiktok_session():
+    return make_session()
+
+def request(session, method, url, timeout=TIMEOUT, **kwargs):
+    """session.request with the default timeout applied."""
+    return session.request(method, url, timeout=timeout, **kwargs)
@@ -1,62 +1,100 @@
+import hashlib
+import hmac
 import json
 import logging
 import random
 import os
-import requests
 import time
+import uuid
+
+from . import http_client
 
 logger = logging.getLogger(__name__)
 
 # ====================== TIKTOK SHOP INTEGRATION ======================
 
-def fetch_tiktok_order(order_id: str):
+TIKTOK_ORDER_BATCH = 50  # order_id_list accepts up to 50 IDs per call
+# Mock orders are opt-in for local testing; otherwise missing credentials are an error.
+TIKTOK_MOCK_ORDERS = os.getenv("TIKTOK_MOCK_ORDERS", "0") == "1"
+
+class TikTokError(Exception):
+    pass
+
+def verify_tiktok_signature(body: bytes, signature: str):
     """
-    Fetches order details from TikTok Shop API using App Key and Secret.
+    Checks a webhook's Authorization header: hex HMAC-SHA256 of app_key + raw body, keyed
+    with the app secret. Without TikTok credentials (local testing) every webhook passes.
+    """
+    app_key = os.getenv("TIKTOK_APP_KEY")
+    app_secret = os.getenv("TIKTOK_APP_SECRET")
+    if not (app_key and app_secret):
+        logger.warning("TikTok credentials missing. Accepting unsigned webhook.")
+        return True
+    expected = hmac.new(app_secret.encode(), app_key.encode() + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+def _parse_tiktok_order(order_id, order_data):
+    addr = order_data.get("recipient_address", {})
+    return {
+        "order_id": order_id,
+        "customer": {
+            "first_name": addr.get("name", "Customer"),
+            "email": order_data.get("buyer_email", ""),
+            "birth_date": "1991-02-17" # Placeholder: TikTok doesn't provide birthdate by default
+        },
+        "shipping_address": {
+            "name": addr.get("name"),
+            "address_line1": addr.get("address_line1"),
+            "city": addr.get("city"),
+            "state": addr.get("state"),
+            "zip_code": addr.get("zip_code"),
+            "country": "US"
+        }
+    }
+
+def fetch_tiktok_orders(order_ids):
+    """
+    Fetches up to TIKTOK_ORDER_BATCH orders in one API call via order_id_list.
+    Returns {order_id: order}; orders missing from the response are left out.
+    Raises TikTokError on API errors and when credentials are missing (unless
+    TIKTOK_MOCK_ORDERS=1, which returns mock orders instead).
     """
     app_key = os.getenv("TIKTOK_APP_KEY")
     app_secret = os.getenv("TIKTOK_APP_SECRET")
     access_token = os.getenv("TIKTOK_ACCESS_TOKEN")
     
     if not all([app_key, app_secret, access_token]):
-        logger.warning("TikTok credentials missing (specifically TIKTOK_ACCESS_TOKEN). Falling back to mock data.")
-        return mock_tiktok_order(order_id)
+        if TIKTOK_MOCK_ORDERS:
+            return {order_id: mock_tiktok_order(order_id) for order_id in order_ids}
+        raise TikTokError("TikTok credentials missing (TIKTOK_APP_KEY, TIKTOK_APP_SECRET, TIKTOK_ACCESS_TOKEN)")
 
     # Simplified TikTok API call structure
-    url = f"https://open-api.tiktokglobalshop.com/api/orders/detail/query"
+    url = f"{http_client.TIKTOK_API_BASE}/api/orders/detail/query"
     params = {
         "app_key": app_key,
         "access_token": access_token,
         "timestamp": int(time.time()),
-        "order_id_list": json.dumps([order_id])
+        "order_id_list": json.dumps(list(order_ids))
     }
     
-    try:
-        response = requests.get(url, params=params)
-        data = response.json()
-        
-        if data.get("code") == 0 and data.get("data", {}).get("order_list"):
-            order_data = data["data"]["order_list"][0]
-            addr = order_data.get("recipient_address", {})
-            return {
-                "order_id": order_id,
-                "customer": {
-                    "first_name": addr.get("name", "Customer"),
-                    "email": order_data.get("buyer_email", ""),
-                    "birth_date": "1991-02-17" # Placeholder: TikTok doesn't provide birthdate by default
-                },
-                "shipping_address": {
-                    "name": addr.get("name"),
-                    "address_line1": addr.get("address_line1"),
-                    "city": addr.get("city"),
-                    "state": addr.get("state"),
-                    "zip_code": addr.get("zip_code"),
-                    "country": "US"
-                }
-            }
-    except Exception as e:
-        logger.error(f"TikTok API Error: {e}")
-        
-    return mock_tiktok_order(order_id)
+    response = http_client.request(http_client.tiktok_session(), "GET", url, params=params)
+    data = response.json()
+    if data.get("code") != 0:
+        raise TikTokError(f"TikTok API error {data.get('code')}: {data.get('message')}")
+    orders = {}
+    for order_data in data.get("data", {}).get("order_list") or []:
+        order_id = str(order_data.get("order_id") or order_data.get("id"))
+        orders[order_id] = _parse_tiktok_order(order_id, order_data)
+    return orders
+
+def fetch_tiktok_order(order_id: str):
+    """
+    Fetches order details from TikTok Shop API using App Key and Secret.
+    Goes through the shared order loader (cache, coalescing, batching); raises
+    orders.OrderLookupError if the order cannot be fetched.
+    """
+    from .orders import get_loader  # orders builds on this module
+    return get_loader().load(order_id)
 
 def mock_tiktok_order(order_id):
     logger.info(f"Using mock data for order {order_id}")
@@ -75,16 +113,24 @@ def mock_tiktok_order(order_id):
 
 # ====================== LOB INTEGRATION ======================
 
-def send_letter_via_lob(pdf_path: str, address: dict):
+def _letter_file(pdf):
+    """Multipart `file` value for a PDF given as a path, bytes or a readable binary stream."""
+    if isinstance(pdf, (str, os.PathLike)):
+        return open(pdf, 'rb')
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return ("letter.pdf", bytes(pdf), "application/pdf")
+    return ("letter.pdf", pdf, "application/pdf")
+
+def create_lob_letter(pdf, address: dict, idempotency_key: str = None, session=None):
     """
-    Sends a physical letter via Lob API using the provided API Key.
+    POSTs a letter to Lob and returns the raw response (status, JSON body, rate-limit headers).
+    Raises on connection errors and when LOB_API_KEY is not set.
     """
     api_key = os.getenv("LOB_API_KEY")
     if not api_key:
-        logger.error("LOB_API_KEY not found in environment.")
-        return {"id": "MOCK_LOB_ID", "status": "mocked"}
+        raise RuntimeError("LOB_API_KEY not found in environment.")
 
-    url = "https://api.lob.com/v1/letters"
+    url = f"{http_client.LOB_API_BASE}/letters"
     
     # Lob payload structure
     data_payload = {
@@ -104,11 +150,30 @@ def send_letter_via_lob(pdf_path: str, address: dict):
         "color": "true"
     }
 
+    letter_file = _letter_file(pdf)
     try:
-        with open(pdf_path, 'rb') as f:
-            files = {"file": f}
-            response = requests.post(url, auth=(api_key, ""), data=data_payload, files=files)
-            
+        files = {"file": letter_file}
+        return http_client.request(
+            session or http_client.lob_session(), "POST", url, auth=(api_key, ""), data=data_payload, files=files,
+            headers={"Idempotency-Key": idempotency_key or uuid.uuid4().hex},
+        )
+    finally:
+        if hasattr(letter_file, "close"):
+            letter_file.close()
+
+def send_letter_via_lob(pdf, address: dict, idempotency_key: str = None):
+    """
+    Sends a physical letter via Lob API using the provided API Key.
+    pdf may be a file path, the PDF bytes, or a readable binary stream.
+    Retries reuse one Idempotency-Key, so Lob creates the letter at most once; pass a stable
+    key (job ID, subscriber key) to extend that to resends of the same letter.
+    """
+    if not os.getenv("LOB_API_KEY"):
+        logger.error("LOB_API_KEY not found in environment.")
+        return {"id": "MOCK_LOB_ID", "status": "mocked"}
+
+    try:
+        response = create_lob_letter(pdf, address, idempotency_key)
         result = response.json()
         if response.status_code == 200:
             logger.info(f"Letter sent via Lob! ID: {result['id']}")
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import engine, letters, metrics
+
+logger = logging.getLogger(__name__)
+
+# ====================== JOB QUEUE ======================
+# Letter jobs live in one SQLite table (WAL mode), so a queued letter survives restarts and
+# several server processes can drain the same file. claim() moves the oldest queued job to
+# "computing" inside an immediate transaction, so each job goes to exactly one worker, and
+# stamps it with the claiming queue's owner ID and a lease of JOB_LEASE_SECONDS. The worker
+# renews the lease while the job runs; a job whose lease ran out belongs to a process that
+# died, and claim() puts it back in the queue. Live jobs of other processes are never touched.
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 60))
+STATUSES = ("queued", "computing", "rendering", "mailed", "failed")
+IN_FLIGHT = ("computing", "rendering")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    lob_id TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    job_id TEXT,
+    received REAL NOT NULL,
+    error TEXT
+);
+"""
+
+class JobQueue:
+    def __init__(self, path=JOBS_DB_PATH, lease_seconds=JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        for table, column, kind in (("jobs", "owner", "TEXT"), ("jobs", "lease_until", "REAL"), ("orders", "error", "TEXT")):
+            if column not in {row["name"] for row in self._db.execute(f"PRAGMA table_info({table})")}:
+                self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")  # queue files from older versions
+
+    def enqueue(self, payload: dict):
+        """Stores a new job and returns its ID."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, created, updated) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(payload), now, now),
+            )
+        return job_id
+
+    # ---------------- webhook orders ----------------
+    # Each TikTok order_id is recorded once ("received") when its webhook arrives and becomes
+    # "enqueued" together with its letter job, so redeliveries are dropped and orders whose
+    # hydration was cut short by a restart can be picked up again. An order that still cannot
+    # be hydrated after the batcher's retries is marked "failed" with the last error.
+
+    def remember_order(self, order_id):
+        """Records a webhook's order_id; False if it was seen before (a redelivery)."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO orders (order_id, status, received) VALUES (?, 'received', ?)",
+                (order_id, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def pending_orders(self):
+        """Order IDs received but not yet turned into letter jobs, oldest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT order_id FROM orders WHERE status = 'received' ORDER BY received").fetchall()
+        return [row[0] for row in rows]
+
+    def get_order(self, order_id):
+        """Order record (status, job_id, error), or None for an unknown order_id."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT order_id, status, job_id, error, received FROM orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def fail_order(self, order_id, error):
+        """Gives up on an order that could not be hydrated or enqueued (unless another process
+        enqueued it meanwhile)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE orders SET status = 'failed', error = ? WHERE order_id = ? AND status = 'received'",
+                (error, order_id),
+            )
+
+    def enqueue_order(self, order_id, payload: dict):
+        """Creates the letter job for a hydrated order and marks the order enqueued.
+
+        Returns the job ID, or None if the order is no longer "received": another process
+        (e.g. a second worker re-flushing at startup) already turned it into a job.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.execute(
+                    "UPDATE orders SET status = 'enqueued', job_id = ? WHERE order_id = ? AND status = 'received'",
+                    (job_id, order_id),
+                )
+                if cursor.rowcount != 1:
+                    self._db.execute("ROLLBACK")
+                    return None
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, payload, created, updated) VALUES (?, 'queued', ?, ?, ?)",
+                    (job_id, json.dumps(payload), now, now),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self):
+        """Requeues jobs with expired leases, then leases the oldest queued job to this queue
+        as computing and returns (id, payload), or None."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                requeued = self._requeue_expired(now)
+                row = self._db.execute(
+                    "SELECT id, payload FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'computing', updated = ?, owner = ?, lease_until = ? WHERE id = ?",
+                        (now, self.owner, now + self.lease_seconds, row["id"]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        if requeued:
+            logger.warning(f"Job queue {self.path}: requeued {requeued} job(s) whose worker stopped renewing its lease")
+        return None if row is None else (row["id"], json.loads(row["payload"]))
+
+    def renew(self, job_id):
+        """Extends this queue's lease on an in-flight job; False if the lease was lost."""
+        with self._lock:
+            cursor = self._db.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status IN ({', '.join('?' * len(IN_FLIGHT))})",
+                (time.time() + self.lease_seconds, job_id, self.owner, *IN_FLIGHT),
+            )
+        return cursor.rowcount == 1
+
+    def update(self, job_id, status, lob_id=None, error=None):
+        """Records a status change of a job this queue holds; False if its lease was lost to another worker."""
+        now = time.time()
+        lease_until = now + self.lease_seconds if status in IN_FLIGHT else None
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, lob_id = COALESCE(?, lob_id), error = ?, updated = ?, lease_until = ? "
+                "WHERE id = ? AND owner = ?",
+                (status, lob_id, error, now, lease_until, job_id, self.owner),
+            )
+        if cursor.rowcount == 0:
+            logger.warning(f"Letter job {job_id}: lease lost, not recording status {status}")
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Job status record, or None for an unknown ID."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, lob_id, error, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in STATUSES} | {status: count for status, count in rows}
+
+    def _requeue_expired(self, now):
+        """Puts in-flight jobs whose lease ran out (or that predate leases) back in the queue."""
+        cursor = self._db.execute(
+            f"UPDATE jobs SET status = 'queued', updated = ?, owner = NULL, lease_until = NULL "
+            f"WHERE status IN ({', '.join('?' * len(IN_FLIGHT))}) AND (lease_until IS NULL OR lease_until < ?)",
+            (now, *IN_FLIGHT, now),
+        )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# ====================== WORKERS ======================
+
+async def run_job(queue, job_id, payload, render, mail):
+    """Computes, renders and mails one letter job, recording each status change.
+
+    render(target_month, first_name, prose, data) and mail(pdf, address, idempotency_key) are
+    the server's awaitable render-pool and Lob helpers. The job ID is the request ID of every
+    log line the job writes.
+    """
+    token = metrics.request_id.set(job_id)
+    try:
+        with metrics.stage("compute"):
+            b_year, b_month, b_day = map(int, payload["birth_date"].split("-"))
+            data = engine.calculate_letter_data(payload["first_name"], b_year, b_month, b_day, f"{payload['target_month']}-15")
+            if "error" in data:
+                raise ValueError(data["error"])
+        with metrics.stage("prose"):
+            prose = letters.compose_prose(data)
+
+        if not await asyncio.to_thread(queue.update, job_id, "rendering"):
+            return  # another worker took the job over; it renders and mails it
+        pdf = await render(payload["target_month"], payload["first_name"], prose, data)
+
+        result = await mail(pdf, payload["address"], job_id)  # job ID doubles as Lob's Idempotency-Key
+        if result.get("status") in ("failed", "mocked"):
+            raise RuntimeError(f"Lob {result.get('status')}")
+        await asyncio.to_thread(queue.update, job_id, "mailed", lob_id=result.get("id"))
+    except Exception as e:
+        logger.error(f"Letter job {job_id} failed: {e}")
+        await asyncio.to_thread(queue.update, job_id, "failed", error=str(e))
+    finally:
+        metrics.request_id.reset(token)
+
+async def keep_lease(queue, job_id):
+    """Renews the job's lease every third of the lease period until cancelled."""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        if not await asyncio.to_thread(queue.renew, job_id):
+            logger.warning(f"Letter job {job_id}: lease lost to another worker")
+            return
+
+async def worker(queue, render, mail, wakeup: asyncio.Event, poll_interval=1.0):
+    """Drains the queue until cancelled; sleeps on `wakeup` (or poll_interval) when it is empty."""
+    while True:
+        job = await asyncio.to_thread(queue.claim)
+        if job is None:
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        lease = asyncio.create_task(keep_lease(queue, job[0]))
+        try:
+            await run_job(queue, *job, render, mail)
+        finally:
+            lease.cancel()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# ====================== BATCH JOURNAL ======================
+# One JSON line per subscriber per completed stage, or a "skipped" line for a row that could
+# not be computed (so a resume does not report it twice). Lines are only ever appended, so a
+# crash loses at most the record being written; on open, a torn last line is cut off and the file
+# is folded into an in-memory index (key -> merged record) that makes resume checks O(1).
+# When superseded lines pile up the journal is compacted to one line per subscriber.
+
+STAGES = ("computed", "rendered", "mailed")
+_STAGE_RANK = {stage: rank for rank, stage in enumerate(STAGES, start=1)}
+
+def subscriber_key(row: dict, target_month: str):
+    """Stable ID for a subscriber's letter: every CSV field plus the letter month.
+
+    Field names are compared as strings: csv.DictReader files a row's surplus fields under
+    the key None.
+    """
+    payload = json.dumps([sorted((str(field), value) for field, value in row.items()), target_month], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class Journal:
+    def __init__(self, path, compact_ratio=2.0, fsync=True):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync
+        self.index = {}
+        self.lines = 0
+        self._file = None
+        self._load()
+        if self.lines > max(len(self.index), 1) * compact_ratio:
+            self.compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            end = 0
+            for number, line in enumerate(f, 1):
+                if not line.endswith(b"\n"):
+                    # Only the final record can be torn (crash mid-append); drop it
+                    logger.warning(f"Journal {self.path}: dropping torn record at byte {end}")
+                    f.truncate(end)
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Journal {self.path}: unreadable record on line {number}") from e
+                self._apply(record)
+                self.lines += 1
+                end += len(line)
+
+    def _apply(self, record):
+        merged = self.index.setdefault(record["key"], {})
+        stage = record.get("stage")
+        for field, value in record.items():
+            if field != "stage":
+                merged[field] = value
+        if _STAGE_RANK.get(stage, 0) > _STAGE_RANK.get(merged.get("stage"), 0):
+            merged["stage"] = stage
+
+    def get(self, key):
+        """Merged record for a subscriber (stage, pdf, lob_id, ...), or None."""
+        return self.index.get(key)
+
+    def done(self, key, stage):
+        """True if the subscriber already completed `stage` (or a later one)."""
+        record = self.index.get(key)
+        return record is not None and _STAGE_RANK.get(record.get("stage"), 0) >= _STAGE_RANK[stage]
+
+    def record(self, key, stage, **fields):
+        """Appends a completed stage for a subscriber."""
+        record = {"key": key, "stage": stage, "ts": round(time.time(), 3), **fields}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._apply(record)
+        self.lines += 1
+
+    def sync(self):
+        """Flushes appended records to stable storage (called at chunk boundaries)."""
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def compact(self):
+        """Rewrites the journal as one merged line per subscriber (atomic replace)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self.index.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.lines = len(self.index)
+        if self._file is not None:
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,53 @@
+import functools
+
+from . import engine
+
+# ====================== LETTER PROSE ======================
+
+LETTER_PROSE = """You're already doing that thing again.
+
+The pattern running right now is the {archetype} in the {realm} domain, activated through {planet} perception.
+
+The uncomfortable line: this is costing you more than you're admitting.
+
+The question that lingers: what would a single day look like if you measured it by what you kept instead of what you shipped?
+
+This cycle isn't about productivity; it's about structural integrity. The friction you feel is the algorithm attempting to correct for a variable you've been trying to ignore. Pay attention to what breaks when you stop pushing."""
+
+def reading_key(data):
+    """Everything the prose depends on: (archetype, realm, planet) of the active period."""
+    period_card = data['period']['card']
+    return engine.get_rank_archetype(period_card), engine.get_suit_realm(period_card), data['period']['planet']
+
+@functools.lru_cache(maxsize=None)
+def prose_for_reading(key):
+    """Letter body for a reading key; at most 13 x 4 x 7 distinct bodies exist."""
+    archetype, realm, planet = key
+    return LETTER_PROSE.format(archetype=archetype, realm=realm.lower(), planet=planet.lower())
+
+def compose_prose(data):
+    """Builds the letter body from calculate_letter_data output (period card + planet)."""
+    return prose_for_reading(reading_key(data))
+
+# ====================== READING PLANNER ======================
+
+class ReadingPlanner:
+    """Groups subscribers by reading key so shared work happens once per distinct reading.
+
+    plan() takes (subscriber, letter data) pairs and returns (key, prose, members) groups;
+    only the per-person fields (name, date, age, birth card) differ inside a group.
+    """
+
+    def __init__(self):
+        self.keys = set()
+
+    def plan(self, items):
+        groups = {}
+        for sub, data in items:
+            groups.setdefault(reading_key(data), []).append((sub, data))
+        self.keys.update(groups)
+        return [(key, prose_for_reading(key), members) for key, members in groups.items()]
+
+    @property
+    def distinct_readings(self):
+        return len(self.keys)
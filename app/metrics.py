@@ -0,0 +1,268 @@
+import bisect
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+
+# ====================== METRICS ======================
+# Process-local counters, gauges and histograms, rendered in the Prometheus text format by
+# the server's /metrics route and written to a file by batch runs (--metrics-out). Updating
+# one is a lock and a few list operations (about a microsecond), so stages are timed on
+# every letter rather than sampled. Gauges and counters may instead take a callback that is
+# read at scrape time, for values another object already tracks (queue depth, pool state,
+# loader stats).
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _sample(name, labels, value):
+    if labels:
+        label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels)
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(_sample(name, labels, value) for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes render() to path atomically (node_exporter textfile collectors read it as-is)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+REGISTRY = Registry()
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=(), fn=None, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return tuple(zip(self.labelnames, key))
+
+    def _callback_values(self):
+        """fn() as {label values: value}; fn returns a number, or a dict keyed by label value(s)."""
+        value = self.fn()
+        if not isinstance(value, dict):
+            return {(): value}
+        return {key if isinstance(key, tuple) else (key,): val for key, val in value.items()}
+
+    def samples(self):
+        if self.fn is not None:
+            values = self._callback_values()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, self._labels(key), value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels, registry=registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the seconds spent inside it."""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(state[0]), state[1], state[2]) for key, state in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(float(bound))),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+# ====================== LETTER METRICS ======================
+# Shared by the server, the job workers and the batch command. Stages: compute
+# (engine.calculate_letter_data), prose (letters.compose_prose), render_queue (waiting for a
+# render worker), render (pdf_generator.build_pdf in the worker) and mail (the Lob upload).
+
+STAGE_SECONDS = Histogram("letter_stage_seconds", "Seconds spent per letter in each stage.", ("stage",))
+BATCH_CHUNK_SECONDS = Histogram("batch_chunk_seconds", "Seconds per batch chunk in chunk-level stages.", ("stage",))
+LETTERS_RENDERED = Counter("letters_rendered_total", "Letters rendered to PDF.")
+LETTERS_MAILED = Counter("letters_mailed_total", "Letters accepted by Lob.")
+LETTERS_FAILED = Counter("letters_failed_total", "Letters that failed, by the stage that failed.", ("stage",))
+PDF_CACHE_LOOKUPS = Counter("pdf_cache_lookups_total", "Rendered-letter cache lookups by result.", ("result",))
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+
+class stage:
+    """Times a letter stage, `with metrics.stage("compute"): ...`; an exception escaping the
+    block counts the letter as failed in that stage instead."""
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            STAGE_SECONDS.observe(time.perf_counter() - self.started, stage=self.name)
+        else:
+            LETTERS_FAILED.inc(stage=self.name)
+
+# ====================== REQUEST IDS ======================
+# The current request's ID lives in a context variable, so it follows the request through
+# awaits and into asyncio.to_thread calls. RequestIdFilter stamps it on every log record.
+
+request_id = contextvars.ContextVar("request_id", default="-")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+def configure_logging(level=logging.INFO):
+    """basicConfig with LOG_FORMAT; every root handler gets the request ID filter."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, RequestIdFilter) for f in handler.filters):
+            handler.addFilter(RequestIdFilter())
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+class RequestContextMiddleware:
+    """ASGI middleware: assigns a request ID (or keeps the caller's X-Request-ID), echoes it
+    in the response, and records the request in HTTP_SECONDS under its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"), None)
+        rid = rid or new_request_id()
+        token = request_id.set(rid)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(time.perf_counter() - started, method=scope["method"],
+                                 route=getattr(route, "path", "unmatched"), status=status)
+            request_id.reset(token)
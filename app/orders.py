@@ -0,0 +1,142 @@
+import collections
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout, wait
+
+from . import integrations
+
+logger = logging.getLogger(__name__)
+
+# ====================== TIKTOK ORDER LOADER ======================
+# Every TikTok order lookup (webhooks, dashboard re-sends, batch replays) goes through one
+# loader per process:
+#   * cache      - hydrated orders are kept for ORDER_CACHE_TTL seconds (LRU-capped);
+#   * coalescing - a lookup for an order already being fetched waits on that fetch;
+#   * batching   - new IDs wait up to ORDER_BATCH_WINDOW seconds (or until a full
+#                  order_id_list) and are fetched together in one API call.
+# Failures are raised as OrderLookupError to every waiting caller; nothing is replaced with
+# mock data, and failures are not cached, so the next lookup asks the API again.
+
+ORDER_BATCH_WINDOW = float(os.getenv("ORDER_BATCH_WINDOW", 0.05))
+ORDER_CACHE_TTL = float(os.getenv("ORDER_CACHE_TTL", 300))
+ORDER_CACHE_SIZE = int(os.getenv("ORDER_CACHE_SIZE", 10000))
+
+class OrderLookupError(Exception):
+    pass
+
+class OrderLoader:
+    def __init__(self, fetch=None, window=ORDER_BATCH_WINDOW, max_batch=integrations.TIKTOK_ORDER_BATCH,
+                 ttl=ORDER_CACHE_TTL, max_cached=ORDER_CACHE_SIZE):
+        self._fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        self.ttl = ttl
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()   # order_id -> (expires, order)
+        self._in_flight = {}                       # order_id -> Future
+        self._batch = []
+        self._timer = None
+        self.stats = {"hits": 0, "coalesced": 0, "fetched": 0, "api_calls": 0, "errors": 0}
+
+    def load(self, order_id, timeout=60):
+        """Hydrated order for order_id; raises OrderLookupError if it cannot be fetched in time."""
+        order_id = str(order_id)
+        try:
+            return self._futures([order_id])[order_id].result(timeout)
+        except FutureTimeout:
+            raise OrderLookupError(f"order {order_id}: lookup timed out") from None
+
+    def load_many(self, order_ids, timeout=60):
+        """Looks up many orders at once; returns ({order_id: order}, {order_id: error})."""
+        futures = self._futures([str(order_id) for order_id in order_ids])
+        wait(futures.values(), timeout)
+        orders, errors = {}, {}
+        for order_id, future in futures.items():
+            if not future.done():
+                errors[order_id] = OrderLookupError(f"order {order_id}: lookup timed out")
+            elif future.exception() is not None:
+                errors[order_id] = future.exception()
+            else:
+                orders[order_id] = future.result()
+        return orders, errors
+
+    def invalidate(self, order_id):
+        with self._lock:
+            self._cache.pop(str(order_id), None)
+
+    def _futures(self, order_ids):
+        """{order_id: Future} for distinct order_ids, queued under one lock so that IDs asked
+        for together land in the same batch."""
+        futures, full = {}, []
+        with self._lock:
+            now = time.monotonic()
+            for order_id in dict.fromkeys(order_ids):
+                cached = self._cache.get(order_id)
+                if cached is not None and cached[0] > now:
+                    self._cache.move_to_end(order_id)
+                    self.stats["hits"] += 1
+                    future = futures[order_id] = Future()
+                    future.set_result(cached[1])
+                    continue
+                future = self._in_flight.get(order_id)
+                if future is not None:
+                    self.stats["coalesced"] += 1
+                    futures[order_id] = future
+                    continue
+                futures[order_id] = self._in_flight[order_id] = Future()
+                self._batch.append(order_id)
+                if len(self._batch) >= self.max_batch:
+                    full.append(self._batch)
+                    self._batch = []
+            if self._batch and self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_due)
+                self._timer.daemon = True
+                self._timer.start()
+        for batch in full:
+            self._flush(batch)
+        return futures
+
+    def _flush_due(self):
+        with self._lock:
+            batch, self._batch, self._timer = self._batch, [], None
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, order_ids):
+        error = None
+        try:
+            orders = (self._fetch or integrations.fetch_tiktok_orders)(order_ids)
+        except Exception as e:
+            logger.error(f"TikTok order lookup failed for {len(order_ids)} order(s): {e}")
+            orders, error = {}, e
+        expires = time.monotonic() + self.ttl
+        settled = []
+        with self._lock:
+            self.stats["api_calls"] += 1
+            for order_id in order_ids:
+                future = self._in_flight.pop(order_id)
+                order = orders.get(order_id)
+                if order is None:
+                    self.stats["errors"] += 1
+                    settled.append((future, None, OrderLookupError(f"order {order_id}: {error or 'not found'}")))
+                    continue
+                self.stats["fetched"] += 1
+                self._cache[order_id] = (expires, order)
+                self._cache.move_to_end(order_id)
+                settled.append((future, order, None))
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        for future, order, exc in settled:
+            if exc is None:
+                future.set_result(order)
+            else:
+                future.set_exception(exc)
+
+@functools.lru_cache(maxsize=None)
+def get_loader():
+    """The process-wide OrderLoader."""
+    return OrderLoader()
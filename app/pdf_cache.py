@@ -0,0 +1,130 @@
+import functools
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# ====================== PDF CACHE ======================
+# Rendered letters on local disk, content-addressed by sha256(template version + the letter's
+# template fields). The fields carry the name, date and prose, so two requests share an entry
+# exactly when they would produce the same document. Entries are written atomically (temp
+# file + rename), so several render processes can share one directory. Reads bump the file's
+# mtime and eviction removes the least recently used files once the directory exceeds
+# max_bytes. The cache is best-effort: an unreadable or corrupt entry is a miss and a failed
+# write (disk full, read-only directory) is logged and skipped, so neither fails a letter.
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+def cache_key(template_version: str, content: str):
+    digest = hashlib.sha256(template_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+class PDFCache:
+    def __init__(self, directory, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pdf")
+
+    def _entries(self):
+        """(path, size, mtime) of every cached PDF."""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pdf"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # evicted by another process mid-scan
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        """Cached PDF bytes for a key, or None (also for an unreadable or corrupt entry)."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pdf = f.read()
+            if not pdf.startswith(b"%PDF"):
+                logger.warning(f"PDF cache entry {path} is corrupt; discarding it")
+                os.remove(path)
+                pdf = None
+            else:
+                os.utime(path)
+        except FileNotFoundError:
+            pdf = None
+        except OSError as e:
+            logger.warning(f"PDF cache read failed for {path}: {e}")
+            pdf = None
+        if pdf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pdf
+
+    def put(self, key, pdf: bytes):
+        """Stores a PDF; returns False (after logging) if it could not be written."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(pdf)
+            try:
+                replaced = os.stat(path).st_size  # overwriting an entry: count only the difference
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"PDF cache write failed for {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        self.size += len(pdf) - replaced
+        if self.size > self.max_bytes:
+            self.evict()
+        return True
+
+    def evict(self, target_ratio=0.9):
+        """Deletes least recently used PDFs until the cache is under target_ratio * max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * target_ratio
+        for path, size, _ in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"PDF cache eviction failed for {path}: {e}")
+                continue
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "bytes": self.size}
+
+@functools.lru_cache(maxsize=None)
+def get_cache():
+    """Process-wide cache at PDF_CACHE_DIR; None when disabled (empty value) or unusable."""
+    if not PDF_CACHE_DIR:
+        return None
+    try:
+        return PDFCache(PDF_CACHE_DIR)
+    except OSError as e:
+        logger.warning(f"PDF cache unavailable at {PDF_CACHE_DIR}: {e}")
+        return None
@@ -1,18 +1,178 @@
+import functools
+import hashlib
+import json
+import logging
 import os
-from weasyprint import HTML
+import re
+import tempfile
+import time
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from weasyprint.urls import FatalURLFetchingError, URLFetcher, URLFetcherResponse
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime
+from . import pdf_cache
 
-def build_pdf(output_path, month_year, first_name, letter_content, additional_data=None):
-    # Setup Jinja2 environment
-    template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template('lob_letter.html')
-    
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+LETTER_TEMPLATE = 'lob_letter.html'
+LETTER_STYLESHEET = 'lob_letter.css'
+
+# Letter fonts (Crimson Pro, Inter). Once every file named in templates/fonts/fonts.css is
+# bundled, those @font-face rules are used and rendering needs no network. Until then the
+# Google Fonts stylesheet is loaded once per process, as the original template linked it; if
+# it cannot be fetched, letters use generic faces (and bypass the PDF cache) and the fetch is
+# retried after FONT_RETRY_SECONDS.
+FONTS_STYLESHEET = os.path.join(TEMPLATE_DIR, 'fonts', 'fonts.css')
+REMOTE_FONTS_URL = ("https://fonts.googleapis.com/css2?family=Crimson+Pro:ital,wght@0,400;0,600;1,400"
+                    "&family=Inter:wght@300;400;600&display=swap")
+FONT_RETRY_SECONDS = float(os.getenv("PDF_FONT_RETRY_SECONDS", 60))
+
+# PDF_OFFLINE=1 makes any non-local resource (http, https, ...) abort the render instead of
+# waiting on DNS/HTTP; the letter template only references files under templates/.
+OFFLINE = os.getenv("PDF_OFFLINE", "0") == "1"
+LOCAL_SCHEMES = ("file", "data")
+
+# spool_pdf_batch keeps a print file in memory up to this size, then spills it to a temp file.
+SPOOL_MAX_BYTES = int(os.getenv("PDF_SPOOL_MAX_BYTES", 8 * 1024 * 1024))
+
+# ====================== RESOURCE FETCHING ======================
+
+class CachingURLFetcher(URLFetcher):
+    """WeasyPrint URL fetcher that keeps every fetched resource (fonts, CSS, images) in memory.
+
+    A resource is read from disk or network once per process; later renders get a copy of the
+    cached bytes. With offline=True, anything but file: and data: URLs raises
+    FatalURLFetchingError, which stops the render immediately.
+    """
+
+    def __init__(self, offline=False, **kwargs):
+        super().__init__(**kwargs)
+        self.offline = offline
+        self.resources = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, url, headers=None):
+        cached = self.resources.get(url)
+        if cached is not None:
+            self.hits += 1
+            return URLFetcherResponse(*cached)
+        scheme = url.split(":", 1)[0].lower()
+        if self.offline and scheme not in LOCAL_SCHEMES:
+            raise FatalURLFetchingError(f"PDF_OFFLINE: refusing to fetch {url}")
+        self.misses += 1
+        response = super().fetch(url, headers)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        if scheme != "data" and response.status in (None, 200):  # file: responses carry no status
+            self.resources[url] = (response.url, body, response.headers, response.status)
+        return URLFetcherResponse(response.url, body, response.headers, response.status)
+
+# ====================== WARM STATE ======================
+# Everything that does not depend on the letter is built once per process: the compiled
+# template, the font configuration, the parsed stylesheet (with its @font-face fonts) and the
+# URL fetcher's resource cache. WeasyPrint's image cache is shared across renders too, so the
+# logo and other assets are decoded once.
+
+_image_cache = {}
+
+@functools.lru_cache(maxsize=None)
+def _template():
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    return env.get_template(LETTER_TEMPLATE)
+
+@functools.lru_cache(maxsize=None)
+def template_version():
+    """Digest of the template, stylesheet and bundled fonts; part of every PDF cache key."""
+    digest = hashlib.sha256()
+    for name in (LETTER_TEMPLATE, LETTER_STYLESHEET):
+        with open(os.path.join(TEMPLATE_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    fonts_dir = os.path.join(TEMPLATE_DIR, 'fonts')
+    if os.path.isdir(fonts_dir):
+        for name in sorted(os.listdir(fonts_dir)):
+            st = os.stat(os.path.join(fonts_dir, name))
+            digest.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def url_fetcher():
+    """The process-wide CachingURLFetcher used by every render."""
+    return CachingURLFetcher(offline=OFFLINE)
+
+@functools.lru_cache(maxsize=None)
+def _font_config():
+    return FontConfiguration()
+
+def fonts_bundled():
+    """True if every font file fonts.css points to is present under templates/fonts."""
+    with open(FONTS_STYLESHEET, encoding='utf-8') as f:
+        names = re.findall(r"url\('([^']+)'\)", f.read())
+    return all(os.path.exists(os.path.join(os.path.dirname(FONTS_STYLESHEET), name)) for name in names)
+
+_fonts = None  # (source, stylesheet) once the letter fonts loaded
+_fonts_failed_at = None
+
+def _font_stylesheet():
+    """(source, stylesheet) for the letter fonts: "bundled" or "google", or ("generic", None)
+    while Google Fonts is unreachable. Raises RuntimeError under PDF_OFFLINE=1 without the
+    bundled files, rather than quietly rendering in substitute faces."""
+    global _fonts, _fonts_failed_at
+    if _fonts is not None:
+        return _fonts
+    if fonts_bundled():
+        _fonts = ("bundled", CSS(filename=FONTS_STYLESHEET, font_config=_font_config(), url_fetcher=url_fetcher()))
+        return _fonts
+    if OFFLINE:
+        raise RuntimeError("PDF_OFFLINE=1 but the letter fonts are not bundled in templates/fonts (see its README)")
+    if _fonts_failed_at is not None and time.monotonic() - _fonts_failed_at < FONT_RETRY_SECONDS:
+        return ("generic", None)
+    try:
+        _fonts = ("google", CSS(url=REMOTE_FONTS_URL, font_config=_font_config(), url_fetcher=url_fetcher()))
+    except Exception as e:
+        _fonts_failed_at = time.monotonic()
+        logger.warning(f"Could not load letter fonts from Google Fonts; rendering with generic faces and "
+                       f"retrying in {FONT_RETRY_SECONDS:g}s ({e})")
+        return ("generic", None)
+    return _fonts
+
+def cache_version():
+    """PDF cache namespace for the next render: template_version() plus the font source, or
+    None while fonts are degraded (such letters are neither cached nor served from cache)."""
+    source, _ = _font_stylesheet()
+    return None if source == "generic" else f"{template_version()}:{source}"
+
+@functools.lru_cache(maxsize=None)
+def _stylesheet():
+    return CSS(filename=os.path.join(TEMPLATE_DIR, LETTER_STYLESHEET), font_config=_font_config(),
+               url_fetcher=url_fetcher())
+
+def _stylesheets():
+    return [sheet for sheet in (_font_stylesheet()[1], _stylesheet()) if sheet is not None]
+
+def warm_up():
+    """Compiles the template, parses the stylesheet and lays out one throwaway letter.
+
+    Call once at worker start-up so the first real letter does not pay for font loading.
+    """
+    _template()
+    _stylesheets()
+    template_version()
+    pdf_cache.get_cache()
+    _write(render_letter_html("2026-03", "Warm", "Warm-up letter."), None)
+
+# ====================== RENDERING ======================
+
+def letter_fields(month_year, first_name, letter_content, additional_data=None):
+    """Template fields for one letter."""
     # Prepare data for template
     date_obj = datetime.strptime(month_year, "%Y-%m")
     date_str = date_obj.strftime("%B %d, %Y")
-    
+
     # Default data if additional_data is not provided
     data = {
         "date_str": date_str,
@@ -22,18 +182,144 @@ def build_pdf(output_path, month_year, first_name, letter_content, additional_da
         "planet": "Mercury",
         "age": "??"
     }
-    
+
     if additional_data:
         data.update({
             "bc": additional_data.get("birth_card", "??"),
             "planet": additional_data.get("period", {}).get("planet", "Mercury"),
             "age": additional_data.get("age", "??")
         })
-    
-    # Render HTML
-    html_content = template.render(**data)
-    
-    # Generate PDF
-    HTML(string=html_content, base_url=template_dir).write_pdf(output_path)
-    
+
+    return data
+
+def render_letter_html(month_year, first_name, letter_content, additional_data=None):
+    return _template().render(letters=[letter_fields(month_year, first_name, letter_content, additional_data)])
+
+def _cache_key(version, fields):
+    """PDF cache key of one letter: the template fields determine its HTML."""
+    return pdf_cache.cache_key(version, json.dumps(fields, sort_keys=True, ensure_ascii=False))
+
+def _render(html_content):
+    return HTML(string=html_content, base_url=TEMPLATE_DIR, url_fetcher=url_fetcher()).render(
+        stylesheets=_stylesheets(), font_config=_font_config(), cache=_image_cache)
+
+def _write(html_content, target):
+    return _render(html_content).write_pdf(target)
+
+def build_pdf(output_path, month_year, first_name, letter_content, additional_data=None):
+    """Renders a letter to output_path (a path or writable file object) and returns it.
+
+    With output_path=None no output file is written and the PDF is returned as bytes. An
+    identical letter rendered before (same template, fields and prose) comes from the PDF
+    cache instead of being laid out again.
+    """
+    fields = letter_fields(month_year, first_name, letter_content, additional_data)
+    cache = pdf_cache.get_cache()
+    version = cache_version() if cache is not None else None
+    key = _cache_key(version, fields) if version is not None else None
+    pdf = cache.get(key) if key is not None else None
+    if pdf is None:
+        pdf = _write(_template().render(letters=[fields]), None)
+        if key is not None:
+            cache.put(key, pdf)
+    if output_path is None:
+        return pdf
+    _save(output_path, pdf)
     return output_path
+
+def _save(output_path, pdf):
+    if hasattr(output_path, 'write'):
+        output_path.write(pdf)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(pdf)
+
+# ====================== BATCH DOCUMENTS ======================
+# Stylesheet cascade, font loading and document setup are paid once per WeasyPrint document,
+# not once per page, so many letters laid out as pages of one document render much faster
+# than the same letters one by one. Each letter starts at its `letter-{i}` anchor, which is
+# how render_batch recovers page ranges; Document.copy(pages) then splits the laid-out
+# document into per-letter PDFs without another layout pass.
+
+def render_batch(letters):
+    """Lays out letters as one document; returns (document, page ranges).
+
+    letters is a sequence of (month_year, first_name, letter_content, additional_data);
+    ranges[i] is the (start, stop) slice of document.pages holding letter i.
+    """
+    return _layout([letter_fields(*letter) for letter in letters])
+
+def _layout(fields):
+    document = _render(_template().render(letters=fields))
+    starts = {}
+    for number, page in enumerate(document.pages):
+        for anchor in page.anchors:
+            if anchor.startswith('letter-'):
+                starts.setdefault(int(anchor[len('letter-'):]), number)
+    bounds = [starts[i] for i in range(len(fields))] + [len(document.pages)]
+    return document, list(zip(bounds, bounds[1:]))
+
+def build_pdf_batch(output_path, letters):
+    """Renders letters as one PDF (each starting on a new page) and returns (output, manifest).
+
+    output_path may be a path or a writable binary file object; output is output_path, or
+    the PDF bytes when output_path is None. manifest[i] is
+    {"index": i, "first_name": ..., "first_page": ..., "last_page": ...} with 1-based,
+    inclusive page numbers, ready to be stored next to a print file.
+    """
+    document, ranges = render_batch(letters)
+    pdf = document.write_pdf(output_path)
+    manifest = [
+        {"index": i, "first_name": letter[1], "first_page": start + 1, "last_page": stop}
+        for i, (letter, (start, stop)) in enumerate(zip(letters, ranges))
+    ]
+    return (pdf if output_path is None else output_path), manifest
+
+def spool_pdf_batch(letters, max_memory=SPOOL_MAX_BYTES):
+    """build_pdf_batch into a SpooledTemporaryFile, rewound; returns (buffer, manifest).
+
+    WeasyPrint writes the PDF into the buffer object by object, so the file stays in memory up
+    to max_memory bytes and continues in an anonymous temp file past that: a batch of
+    thousands of letters never holds its whole PDF in RAM. The caller closes the buffer; it
+    can be passed straight to integrations.send_letter_via_lob or copied to storage.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+    try:
+        _, manifest = build_pdf_batch(buffer, letters)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer, manifest
+
+def split_batch(document, ranges):
+    """Per-letter PDF bytes cut from a laid-out batch document (no re-layout)."""
+    return [document.copy(document.pages[start:stop]).write_pdf() for start, stop in ranges]
+
+def build_pdfs(jobs):
+    """Renders each (output_path, month_year, first_name, letter_content, additional_data) job
+    to its own file with a single layout pass for all of them.
+
+    Letters already in the PDF cache are copied from it; the rest are laid out together as one
+    batch document, split by page range, written out and added to the cache.
+    """
+    cache = pdf_cache.get_cache()
+    version = cache_version() if cache is not None else None
+    pending = []
+    for job in jobs:
+        output_path, fields = job[0], letter_fields(*job[1:])
+        key = None
+        if version is not None:
+            key = _cache_key(version, fields)
+            pdf = cache.get(key)
+            if pdf is not None:
+                _save(output_path, pdf)
+                continue
+        pending.append((output_path, fields, key))
+    if not pending:
+        return
+    document, ranges = _layout([fields for _, fields, _ in pending])
+    for (output_path, _, key), pdf in zip(pending, split_batch(document, ranges)):
+        _save(output_path, pdf)
+        if key is not None:
+            cache.put(key, pdf)
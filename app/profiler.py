@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import collections
+import glob
+import itertools
+import os
+import sys
+import threading
+import time
+
+from . import metrics
+
+# ====================== SAMPLING PROFILER ======================
+# A thread that wakes every PROFILE_INTERVAL seconds, reads every other thread's stack with
+# sys._current_frames() and counts it. Nothing is instrumented, so code runs at full speed
+# between samples; a sample costs tens of microseconds (one frame walk per thread, labels
+# cached per code object), about 1% of one core at the default 200 Hz. Stacks are counted
+# under their thread name, so event-loop blocking shows up as deep stacks under MainThread.
+# Render workers are separate processes: while a profile is active the renderer pool asks
+# them to sample their own build_pdf calls and merges the stacks in under "render-worker".
+#
+# Output is the collapsed-stack format of flamegraph.pl / speedscope / inferno
+# ("thread;outer;...;inner count" per line) plus a hotspot table (self and total samples).
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.005))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 120))
+PROFILE_EVERY_K = int(os.getenv("PROFILE_EVERY_K", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+
+# Leaf frames of threads parked in a wait: the event loop in select(), idle executor and
+# renderer threads on their queues. Dropped unless idle=True, as py-spy does by default.
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("connection.py", "_recv"),
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+_labels = {}
+
+def _label(code):
+    """'function (file:first line)' for a code object; repo files relative, the rest by file name."""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(ROOT + os.sep):
+            path = os.path.relpath(path, ROOT)
+        elif "site-packages" in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        else:
+            path = os.path.basename(path)
+        label = _labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+    return label
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+class Sampler:
+    """Counts the stacks of this process's threads (or only thread_ids) every interval seconds."""
+
+    def __init__(self, interval=PROFILE_INTERVAL, thread_ids=None, idle=False):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.idle = idle
+        self.counts = collections.Counter()
+        self.samples = 0
+        self.started = self.stopped = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.time()
+        return self
+
+    def add(self, counts, root=None):
+        """Merges stacks sampled elsewhere (a render worker), optionally under another root name."""
+        with self._lock:
+            for stack, n in counts.items():
+                self.counts[(root,) + stack[1:] if root else stack] += n
+
+    def _run(self):
+        own = threading.get_ident()
+        next_at = time.perf_counter()
+        while not self._stop.wait(max(0.0, next_at - time.perf_counter())):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                        continue
+                    if not self.idle and _is_idle(frame):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    self.counts[tuple(reversed(stack))] += 1
+                self.samples += 1
+            next_at += self.interval
+            del frames
+
+    def collapsed(self):
+        with self._lock:
+            return collapsed(self.counts)
+
+    def summary(self, top=20):
+        with self._lock:
+            counts = collections.Counter(self.counts)
+        return {
+            "seconds": round((self.stopped or time.time()) - self.started, 3),
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": sum(counts.values()),
+            "hotspots": hotspots(counts, top),
+        }
+
+def collapsed(counts):
+    """Collapsed-stack text, heaviest stacks first."""
+    return "".join(f"{';'.join(stack)} {n}\n" for stack, n in counts.most_common())
+
+def parse_collapsed(text, counts=None):
+    counts = collections.Counter() if counts is None else counts
+    for line in text.splitlines():
+        stack, _, n = line.rpartition(" ")
+        if stack:
+            counts[tuple(stack.split(";"))] += int(n)
+    return counts
+
+def hotspots(counts, top=20):
+    """The top frames by self samples (on top of the stack), with their total (anywhere on it)."""
+    self_counts, total_counts = collections.Counter(), collections.Counter()
+    for stack, n in counts.items():
+        frames = stack[1:]  # stack[0] is the thread name
+        if frames:
+            self_counts[frames[-1]] += n
+        for frame in set(frames):
+            total_counts[frame] += n
+    total = sum(counts.values()) or 1
+    return [{"frame": frame, "self": n, "self_pct": round(100 * n / total, 1),
+             "total": total_counts[frame], "total_pct": round(100 * total_counts[frame] / total, 1)}
+            for frame, n in self_counts.most_common(top)]
+
+# ====================== ACTIVE PROFILE ======================
+# One profile runs at a time per process, whether from /admin/profile or every-Kth-request
+# mode, so their samplers never stack up. The renderer pool reads active() per job.
+
+_active = None
+_active_lock = threading.Lock()
+
+def begin(interval=PROFILE_INTERVAL, idle=False):
+    """Starts the process-wide profile; raises ProfilerBusy if one is already running."""
+    global _active
+    with _active_lock:
+        if _active is not None:
+            raise ProfilerBusy("a profile is already running")
+        _active = Sampler(interval, idle=idle).start()
+        return _active
+
+def end(sampler):
+    global _active
+    sampler.stop()
+    with _active_lock:
+        if _active is sampler:
+            _active = None
+    return sampler
+
+def active():
+    return _active
+
+# ====================== EVERY Kth REQUEST ======================
+
+SKIP_PATHS = ("/health", "/metrics", "/admin/profile")
+
+class EveryKthRequestProfiler:
+    """ASGI middleware: profiles every k-th request and writes its collapsed stacks to directory,
+    keeping the newest `keep` files. The profile covers the whole process while the request runs.
+    Add it inside metrics.RequestContextMiddleware so file names carry the request ID."""
+
+    def __init__(self, app, every=PROFILE_EVERY_K, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.app = app
+        self.every = every
+        self.directory = directory
+        self.keep = keep
+        self._requests = itertools.count(1)
+        self._written = itertools.count()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in SKIP_PATHS or next(self._requests) % self.every:
+            return await self.app(scope, receive, send)
+        try:
+            sampler = begin()
+        except ProfilerBusy:
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end(sampler)
+            name = "-".join((time.strftime("%Y%m%d-%H%M%S"), f"{next(self._written):06d}", scope["method"],
+                             scope["path"].strip("/").replace("/", "_") or "root", metrics.request_id.get()))
+            await asyncio.to_thread(self.write, sampler, name)
+
+    def write(self, sampler, name):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}.collapsed")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        os.replace(path + ".tmp", path)
+        for old in sorted(glob.glob(os.path.join(self.directory, "*.collapsed")))[:-self.keep]:
+            os.remove(old)
+
+# ====================== CLI ======================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge collapsed-stack profiles and print their hotspots.")
+    parser.add_argument("paths", nargs="*", default=[PROFILE_DIR], help="Collapsed files or directories of them")
+    parser.add_argument("--top", type=int, default=20, help="Frames to list")
+    parser.add_argument("--collapsed", default=None, help="Also write the merged stacks here (for flamegraph.pl)")
+    args = parser.parse_args(argv)
+
+    counts, files = collections.Counter(), 0
+    for path in args.paths:
+        for name in sorted(glob.glob(os.path.join(path, "*.collapsed"))) if os.path.isdir(path) else [path]:
+            with open(name, encoding="utf-8") as f:
+                parse_collapsed(f.read(), counts)
+            files += 1
+    total = sum(counts.values())
+    print(f"{files} profiles, {total} samples")
+    print(f"{'self %':>7} {'total %':>8}  frame")
+    for row in hotspots(counts, args.top):
+        print(f"{row['self_pct']:7.1f} {row['total_pct']:8.1f}  {row['frame']}")
+    if args.collapsed:
+        with open(args.collapsed, "w", encoding="utf-8") as f:
+            f.write(collapsed(counts))
+
+if __name__ == "__main__":
+    main()
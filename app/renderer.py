@@ -0,0 +1,200 @@
+import collections
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from . import profiler
+
+logger = logging.getLogger(__name__)
+
+# ====================== RENDERER POOL ======================
+# A fixed set of long-lived render processes. Each one imports pdf_generator and calls
+# warm_up() once, so the compiled template, parsed stylesheet and loaded fonts are reused
+# by every letter it renders. One supervising thread per worker feeds it jobs over a pipe,
+# enforces the per-job timeout (killing and replacing a stuck process) and recycles the
+# process after max_jobs_per_worker letters to keep memory growth in check.
+
+class RenderTimeout(Exception):
+    pass
+
+RenderResult = collections.namedtuple("RenderResult", "output seconds queued cached")
+
+def _worker_main(conn):
+    from . import pdf_cache, pdf_generator
+    pdf_generator.warm_up()
+    cache = pdf_cache.get_cache()
+    conn.send(("ready", os.getpid()))
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        args, kwargs, profile_interval = job
+        # While the server is profiling, sample this render too and send the stacks back
+        sampler = profiler.Sampler(profile_interval, thread_ids=[threading.get_ident()]).start() if profile_interval else None
+        started = time.perf_counter()
+        hits = cache.hits if cache is not None else 0
+        try:
+            ok, output = True, pdf_generator.build_pdf(*args, **kwargs)
+            cached = cache.hits > hits if cache is not None else None
+        except Exception as e:
+            ok, output, cached = False, f"{type(e).__name__}: {e}", None
+        seconds = time.perf_counter() - started
+        conn.send((ok, output, seconds, cached, dict(sampler.stop().counts) if sampler else None))
+
+class RendererPool:
+    def __init__(self, workers=None, max_jobs_per_worker=200, timeout=30.0, startup_timeout=60.0, target=_worker_main):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.target = target  # worker entry point; tests swap in stubs that speak the same protocol
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs = queue.Queue()
+        self._latencies = collections.deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self.counters = {"jobs": 0, "failed": 0, "timeouts": 0, "recycled": 0}
+        self.busy = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._supervise, name=f"renderer-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ---------------- public API ----------------
+
+    def submit(self, *args, **kwargs):
+        """Queues a build_pdf(*args, **kwargs) call; the Future resolves to a RenderResult."""
+        if self._closed:
+            raise RuntimeError("RendererPool is closed")
+        future = Future()
+        self._jobs.put((future, args, kwargs, time.perf_counter()))
+        return future
+
+    def render(self, *args, **kwargs):
+        """Blocking submit(): renders one letter and returns its RenderResult."""
+        return self.submit(*args, **kwargs).result()
+
+    def stats(self):
+        """Job counters, busy workers, waiting jobs and p50/p95/max render seconds over the last 1000 letters."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.counters, workers=self.workers, busy=self.busy, waiting=self._jobs.qsize())
+        if latencies:
+            stats.update(
+                p50=latencies[len(latencies) // 2],
+                p95=latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+                max=latencies[-1],
+            )
+        return stats
+
+    def close(self, wait=True):
+        """Stops accepting work; workers finish queued jobs and exit."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- supervision ----------------
+
+    def _start(self):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(target=self.target, args=(child,), daemon=True)
+        process.start()
+        child.close()
+        if not parent.poll(self.startup_timeout):
+            process.kill()
+            raise RenderTimeout(f"render worker did not start within {self.startup_timeout}s")
+        parent.recv()
+        return process, parent
+
+    def _stop(self, process, conn, graceful=True):
+        if graceful and process.is_alive():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+
+    def _supervise(self):
+        process = conn = None
+        done = 0
+        try:
+            process, conn = self._start()  # warm up before the first job arrives
+        except Exception as e:
+            logger.warning(f"Render worker failed to start; retrying on first job ({e!r})")
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            future, args, kwargs, submitted = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self.busy += 1
+            try:
+                if process is None:
+                    process, conn = self._start()
+                    done = 0
+                queued = time.perf_counter() - submitted
+                sampler = profiler.active()
+                conn.send((args, kwargs, sampler.interval if sampler else None))
+                if not conn.poll(self.timeout):
+                    raise RenderTimeout(f"render exceeded {self.timeout}s")
+                ok, output, seconds, cached, stacks = conn.recv()
+                if stacks and sampler:
+                    sampler.add(stacks, root="render-worker")
+            except Exception as e:
+                if isinstance(e, RenderTimeout):
+                    with self._lock:
+                        self.counters["timeouts"] += 1
+                    logger.warning(f"Render worker timed out; replacing it ({e})")
+                else:
+                    logger.warning(f"Render worker failed; replacing it ({e!r})")
+                    e = RuntimeError(f"render worker failed: {e!r}")
+                if process is not None:
+                    self._stop(process, conn, graceful=False)
+                process = conn = None
+                with self._lock:
+                    self.counters["failed"] += 1
+                    self.busy -= 1
+                future.set_exception(e)
+                continue
+
+            done += 1
+            with self._lock:
+                self.busy -= 1
+                self.counters["jobs"] += 1
+                self._latencies.append(seconds)
+                if not ok:
+                    self.counters["failed"] += 1
+            if ok:
+                future.set_result(RenderResult(output, seconds, queued, cached))
+            else:
+                future.set_exception(RuntimeError(output))
+            if done >= self.max_jobs_per_worker:
+                self._stop(process, conn)
+                process = conn = None
+                with self._lock:
+                    self.counters["recycled"] += 1
+        if process is not None:
+            self._stop(process, conn)
@@ -1,22 +1,147 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
 import datetime
+import functools
+import hmac
+import json
 import logging
 import os
-from . import engine, integrations, pdf_generator
+from . import engine, integrations, jobs, letters, metrics, orders, profiler, webhooks
+from .renderer import RendererPool, RenderTimeout
 
-app = FastAPI(title="Analog Algorithm Engine", version="1.1.0")
+# ====================== CONCURRENCY ======================
+# Rendering is CPU-bound and runs in a pool of warm render processes; Lob uploads are
+# blocking HTTP and run in a small thread pool. The event loop only computes readings
+# (microseconds) and awaits, so /health and the dashboard stay responsive while letters
+# render. At most MAX_PENDING_LETTERS letters are in flight; beyond that requests get a
+# 503 with Retry-After instead of queueing without bound.
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 8))
+MAX_PENDING_LETTERS = int(os.getenv("MAX_PENDING_LETTERS", RENDER_WORKERS * 4))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", 30))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", RENDER_WORKERS * 2))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(engine.get_reading_table)  # map (or, failing that, give up on) the table before traffic
+    app.state.renderer = RendererPool(workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT)
+    app.state.mailer = ThreadPoolExecutor(max_workers=MAIL_WORKERS, thread_name_prefix="lob")
+    app.state.pending = 0
+    app.state.mailing = 0
+    app.state.jobs = jobs.JobQueue()
+    app.state.job_wakeup = asyncio.Event()
+    workers = [
+        asyncio.create_task(jobs.worker(app.state.jobs, render_letter, mail_letter, app.state.job_wakeup))
+        for _ in range(JOB_WORKERS)
+    ]
+    app.state.orders = webhooks.OrderBatcher(app.state.jobs, on_enqueued=app.state.job_wakeup.set)
+    workers.append(asyncio.create_task(app.state.orders.run()))
+    try:
+        yield
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        app.state.jobs.close()
+        app.state.renderer.close(wait=False)
+        app.state.mailer.shutdown(wait=False)
+
+app = FastAPI(title="Analog Algorithm Engine", version="1.1.0", lifespan=lifespan)
+if profiler.PROFILE_EVERY_K > 0:
+    app.add_middleware(profiler.EveryKthRequestProfiler)  # added first: runs inside the request ID middleware
+app.add_middleware(metrics.RequestContextMiddleware)
+
+# Setup logging (every line carries the request ID)
+metrics.configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def render_letter(target_month, first_name, prose, data):
+    """Renders a letter in the render pool and returns the PDF bytes."""
+    future = app.state.renderer.submit(None, target_month, first_name, prose, additional_data=data)
+    try:
+        result = await asyncio.wrap_future(future)
+    except Exception:
+        metrics.LETTERS_FAILED.inc(stage="render")
+        raise
+    metrics.STAGE_SECONDS.observe(result.queued, stage="render_queue")
+    metrics.STAGE_SECONDS.observe(result.seconds, stage="render")
+    metrics.LETTERS_RENDERED.inc()
+    if result.cached is not None:
+        metrics.PDF_CACHE_LOOKUPS.inc(result="hit" if result.cached else "miss")
+    return result.output
+
+async def mail_letter(pdf, address, idempotency_key=None):
+    """Uploads a letter to Lob from the mail thread pool."""
+    loop = asyncio.get_running_loop()
+    upload = functools.partial(contextvars.copy_context().run, integrations.send_letter_via_lob, pdf, address, idempotency_key)
+    app.state.mailing += 1
+    try:
+        with metrics.stage("mail"):
+            result = await loop.run_in_executor(app.state.mailer, upload)
+    finally:
+        app.state.mailing -= 1
+    if result.get("status") == "failed":
+        metrics.LETTERS_FAILED.inc(stage="mail")
+    elif result.get("status") != "mocked":
+        metrics.LETTERS_MAILED.inc()
+    return result
+
+# ====================== METRICS ======================
+# Stage timings and letter counters are recorded where the work happens (see metrics.py);
+# these read the server's own state whenever /metrics is scraped.
+
+def _render_pool_stats():
+    renderer = getattr(app.state, "renderer", None)
+    return renderer.stats() if renderer else {"workers": 0, "busy": 0, "waiting": 0}
+
+def _render_pool_utilization():
+    stats = _render_pool_stats()
+    return stats["busy"] / stats["workers"] if stats["workers"] else 0.0
+
+metrics.Gauge("letters_in_flight", "Test letters being computed, rendered or mailed.",
+              fn=lambda: getattr(app.state, "pending", 0))
+metrics.Gauge("mail_in_flight", "Lob uploads running or waiting for a mail thread.",
+              fn=lambda: getattr(app.state, "mailing", 0))
+metrics.Gauge("render_pool_utilization", "Fraction of render workers busy.",
+              fn=_render_pool_utilization)
+metrics.Gauge("render_pool_waiting", "Letters waiting for a render worker.", fn=lambda: _render_pool_stats()["waiting"])
+metrics.Gauge("job_queue_depth", "Letter jobs by status.", ("status",),
+              fn=lambda: app.state.jobs.counts() if hasattr(app.state, "jobs") else {})
+metrics.Counter("tiktok_order_lookups_total", "TikTok order lookups by result.", ("result",),
+                fn=lambda: {key: orders.get_loader().stats[key] for key in ("hits", "coalesced", "fetched", "errors")})
+metrics.Counter("tiktok_api_calls_total", "Bulk TikTok order API calls.", fn=lambda: orders.get_loader().stats["api_calls"])
+
+def _webhook_stats():
+    batcher = getattr(app.state, "orders", None)
+    return batcher.stats if batcher else {}
+
+metrics.Counter("webhook_orders_total", "Webhook orders by outcome.", ("result",),
+                fn=lambda: {key: value for key, value in _webhook_stats().items() if key != "flush_errors"})
+metrics.Counter("webhook_flush_errors_total", "Order batches whose hydration or enqueueing raised.",
+                fn=lambda: _webhook_stats().get("flush_errors", 0))
+
 class LetterRequest(BaseModel):
     first_name: str
     birth_date: str
     target_month: str
 
+class MailingAddress(BaseModel):
+    name: str
+    address_line1: str
+    city: str
+    state: str
+    zip_code: str
+
+class LetterJobRequest(LetterRequest):
+    address: MailingAddress
+
 # THE DASHBOARD HTML (Inlined to ensure it loads)
 DASHBOARD_HTML = """
 <!DOCTYPE html>
@@ -95,40 +220,102 @@ async def dashboard():
 async def health():
     return {"status": "alive"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus scrape target (text format 0.0.4). Sync, so gauge callbacks run off the loop."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/profile")
+async def profile(request: Request, seconds: float = 10, top: int = 20, format: str = "json", idle: bool = False):
+    """Samples this worker's stacks (and its render processes') for `seconds` while it serves
+    traffic. format=collapsed returns the flamegraph input as text; json adds the hotspots."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    if not 0 < seconds <= profiler.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {profiler.PROFILE_MAX_SECONDS:g}]")
+    try:
+        sampler = profiler.begin(idle=idle)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.end(sampler)
+    if format == "collapsed":
+        return PlainTextResponse(sampler.collapsed())
+    return dict(sampler.summary(top), collapsed=sampler.collapsed())
+
 @app.post("/admin/generate-test")
 async def generate_test_letter(req: LetterRequest):
+    if app.state.pending >= MAX_PENDING_LETTERS:
+        raise HTTPException(status_code=503, detail="Too many letters in progress; retry shortly", headers={"Retry-After": "1"})
+    app.state.pending += 1
     try:
         b_year, b_month, b_day = map(int, req.birth_date.split("-"))
         target_date = f"{req.target_month}-15"
-        data = engine.calculate_letter_data(req.first_name, b_year, b_month, b_day, target_date)
+        with metrics.stage("compute"):
+            data = engine.calculate_letter_data(req.first_name, b_year, b_month, b_day, target_date)
         
         # Generate Professional Prose
-        period_card = data['period']['card']
-        planet = data['period']['planet']
-        archetype = engine.get_rank_archetype(period_card)
-        realm = engine.get_suit_realm(period_card)
-        
-        prose = f"""You're already doing that thing again.
-
-The pattern running right now is the {archetype} in the {realm.lower()} domain, activated through {planet.lower()} perception.
-
-The uncomfortable line: this is costing you more than you're admitting.
-
-The question that lingers: what would a single day look like if you measured it by what you kept instead of what you shipped?
-
-This cycle isn't about productivity; it's about structural integrity. The friction you feel is the algorithm attempting to correct for a variable you've been trying to ignore. Pay attention to what breaks when you stop pushing."""
+        with metrics.stage("prose"):
+            prose = letters.compose_prose(data)
         
-        filename = f"manual_{req.first_name}.pdf"
-        pdf_path = os.path.join(os.getcwd(), filename)
-        pdf_generator.build_pdf(pdf_path, req.target_month, req.first_name, prose, additional_data=data)
+        # Rendered in memory and uploaded straight from the buffer: no temp file to race on
+        pdf_bytes = await render_letter(req.target_month, req.first_name, prose, data)
         
         addr = {"name": req.first_name, "address_line1": "123 Test St", "city": "Portland", "state": "OR", "zip_code": "97204"}
-        integrations.send_letter_via_lob(pdf_path, addr)
+        await mail_letter(pdf_bytes, addr)
         
         return {"message": "Success", "engine_data": data}
+    except RenderTimeout as e:
+        logger.error(f"Render timed out for test letter: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         logger.error(f"Error generating test letter: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        app.state.pending -= 1
+
+# ====================== LETTER JOBS ======================
+
+@app.post("/letters", status_code=202)
+async def create_letter_job(req: LetterJobRequest):
+    """Queues a letter (compute, render, mail) and returns its job ID right away."""
+    try:
+        datetime.date.fromisoformat(req.birth_date)
+        datetime.datetime.strptime(req.target_month, "%Y-%m")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    job_id = await asyncio.to_thread(app.state.jobs.enqueue, req.model_dump())
+    app.state.job_wakeup.set()
+    return {"id": job_id, "status": "queued"}
+
+@app.get("/letters/{job_id}")
+async def get_letter_job(job_id: str):
+    job = await asyncio.to_thread(app.state.jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown letter job")
+    return job
+
+# ====================== TIKTOK WEBHOOK ======================
+
+@app.post("/webhook/tiktok")
+async def tiktok_webhook(request: Request):
+    """Verifies and acknowledges an order webhook; hydration and the letter job follow in bulk."""
+    body = await request.body()
+    if not integrations.verify_tiktok_signature(body, request.headers.get("Authorization", "")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    order_id = webhooks.order_id_from_event(event)
+    if order_id is None:
+        return {"code": 0, "message": "ignored"}
+    new = await app.state.orders.receive(order_id)
+    return {"code": 0, "message": "accepted" if new else "duplicate"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,135 @@
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+
+from . import integrations
+from .orders import get_loader
+
+logger = logging.getLogger(__name__)
+
+# ====================== TIKTOK ORDER WEBHOOKS ======================
+# The webhook route only verifies the signature, records the order_id (dropping
+# redeliveries) and hands the ID to an OrderBatcher, so TikTok gets its 200 in milliseconds.
+# The batcher collects IDs for up to WEBHOOK_BATCH_WINDOW seconds (or until a full
+# order_id_list of TIKTOK_ORDER_BATCH), hydrates them through the shared order loader (see
+# orders.py) and enqueues a letter job per order. A promotion spike becomes a few bulk calls
+# instead of one serial call per order. Orders that fail to hydrate or enqueue are retried
+# every retry_interval seconds, up to WEBHOOK_ORDER_ATTEMPTS attempts, and then marked failed
+# in the orders table. A failing flush is logged and never stops the batcher.
+
+WEBHOOK_BATCH_WINDOW = float(os.getenv("WEBHOOK_BATCH_WINDOW", 0.5))
+WEBHOOK_ORDER_ATTEMPTS = int(os.getenv("WEBHOOK_ORDER_ATTEMPTS", 5))
+
+def order_id_from_event(event: dict):
+    """order_id carried by a TikTok Shop webhook event, or None for other event types."""
+    order_id = (event.get("data") or {}).get("order_id")
+    return str(order_id) if order_id else None
+
+def letter_job_payload(order: dict, target_month: str):
+    """Letter job fields (see server.LetterJobRequest) for a hydrated TikTok order."""
+    shipping = order["shipping_address"]
+    return {
+        "first_name": order["customer"]["first_name"],
+        "birth_date": order["customer"]["birth_date"],
+        "target_month": target_month,
+        "address": {field: shipping.get(field) for field in ("name", "address_line1", "city", "state", "zip_code")},
+        "order_id": order["order_id"],
+    }
+
+class OrderBatcher:
+    def __init__(self, queue, on_enqueued=None, window=WEBHOOK_BATCH_WINDOW,
+                 max_batch=integrations.TIKTOK_ORDER_BATCH, retry_interval=30.0, loader=None,
+                 max_attempts=WEBHOOK_ORDER_ATTEMPTS):
+        self.queue = queue
+        self.loader = loader or get_loader()
+        self.on_enqueued = on_enqueued
+        self.window = window
+        self.max_batch = max_batch
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self._pending = {}  # order IDs waiting for a flush, in arrival order (a dict: no duplicates)
+        self._attempts = {}  # order_id -> failed attempts so far
+        self._ready = asyncio.Event()
+        self.stats = {"received": 0, "duplicates": 0, "batches": 0, "enqueued": 0, "retried": 0, "failed": 0,
+                      "taken": 0, "flush_errors": 0}
+
+    async def receive(self, order_id):
+        """Records an order from a webhook; returns False for a redelivered order_id."""
+        if not await asyncio.to_thread(self.queue.remember_order, order_id):
+            self.stats["duplicates"] += 1
+            return False
+        self.stats["received"] += 1
+        self.add(order_id)
+        return True
+
+    def add(self, order_id):
+        self._pending[order_id] = None
+        self._ready.set()
+
+    async def run(self):
+        """Hydrates and enqueues buffered orders until cancelled."""
+        for order_id in await asyncio.to_thread(self.queue.pending_orders):
+            self.add(order_id)  # received before a restart, never enqueued
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.window)
+            batch = list(itertools.islice(self._pending, self.max_batch))
+            for order_id in batch:
+                del self._pending[order_id]
+            if not self._pending:
+                self._ready.clear()
+            try:
+                await self.flush(batch)
+            except Exception:
+                self.stats["flush_errors"] += 1
+                logger.exception(f"Flushing {len(batch)} TikTok order(s) failed")
+
+    async def flush(self, order_ids):
+        self.stats["batches"] += 1
+        try:
+            orders, errors = await asyncio.to_thread(self.loader.load_many, order_ids)
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logger.exception(f"Hydrating {len(order_ids)} TikTok order(s) failed")
+            orders, errors = {}, dict.fromkeys(order_ids, f"{type(e).__name__}: {e}")
+        for order_id, error in errors.items():
+            logger.error(f"TikTok order {order_id} not hydrated: {error}")
+        target_month = datetime.date.today().strftime("%Y-%m")
+        missing = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is not None:
+                try:
+                    job_id = await asyncio.to_thread(self.queue.enqueue_order, order_id, letter_job_payload(order, target_month))
+                    self.stats["enqueued" if job_id else "taken"] += 1
+                    self._attempts.pop(order_id, None)
+                    continue
+                except Exception as e:
+                    logger.exception(f"TikTok order {order_id}: letter job not enqueued")
+                    errors[order_id] = f"{type(e).__name__}: {e}"
+            missing.append(order_id)
+        if self.on_enqueued and len(missing) < len(order_ids):
+            self.on_enqueued()
+        if missing:
+            await self._retry_or_fail(missing, errors)
+
+    async def _retry_or_fail(self, order_ids, errors):
+        """Schedules another attempt for each order, or marks it failed after max_attempts."""
+        retry = []
+        for order_id in order_ids:
+            self._attempts[order_id] = self._attempts.get(order_id, 0) + 1
+            if self._attempts[order_id] < self.max_attempts:
+                retry.append(order_id)
+                continue
+            del self._attempts[order_id]
+            self.stats["failed"] += 1
+            error = str(errors.get(order_id, "order not found"))
+            logger.error(f"TikTok order {order_id} failed after {self.max_attempts} attempts: {error}")
+            await asyncio.to_thread(self.queue.fail_order, order_id, error)
+        if retry:
+            self.stats["retried"] += len(retry)
+            logger.warning(f"{len(retry)} TikTok order(s) not hydrated; retrying in {self.retry_interval}s")
+            asyncio.get_running_loop().call_later(self.retry_interval, lambda: [self.add(o) for o in retry])
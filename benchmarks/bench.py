@@ -0,0 +1,314 @@
+# benchmarks/bench.py - Timed benchmark cases with JSON baselines
+#
+#   python -m benchmarks.bench --save-baseline        # record this machine's baseline
+#   python -m benchmarks.bench                        # compare; exit 1 on a regression
+#   python -m benchmarks.bench --cases calculate_letter_data,extract_chain --threshold 10
+#
+# Every case reports seconds per operation (median over --repeat runs). Results are written
+# to benchmarks/results/latest.json and compared with the baseline (benchmarks/baseline.json
+# by default); a case slower than the baseline by more than --threshold percent (default
+# BENCH_THRESHOLD or 15) fails the run. Baselines only mean something on the machine that
+# recorded them, so record one before and after a change on the same box.
+#
+# PDF and request-path cases need WeasyPrint and are reported as skipped without it. The
+# request path runs the real server against tools/fake_services.py, so no network is used.
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from app import engine, letters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "results", "latest.json")
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", 15))
+
+class Skip(Exception):
+    pass
+
+CASES = {}
+
+def case(name):
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+def measure(fn, ops, repeat):
+    """Runs fn `repeat` times; fn performs `ops` operations per run."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) / ops)
+    median = statistics.median(runs)
+    return {"seconds": median, "min": min(runs), "ops": ops, "repeat": repeat,
+            "ops_per_sec": round(1 / median, 1) if median else None}
+
+def sample_birthdays(count, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randint(1940, 2008), rng.randint(1, 12), rng.randint(1, 28)) for _ in range(count)]
+
+def require_weasyprint():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as e:
+        raise Skip(f"WeasyPrint unavailable: {e}")
+
+# ====================== ENGINE ======================
+
+@case("generate_yearly_spread_data")
+def bench_spreads(args):
+    years = range(engine.MAX_SPREAD_YEAR + 1)
+    return measure(lambda: [engine.generate_yearly_spread_data(y) for y in years], len(years), args.repeat * 5)
+
+@case("extract_chain")
+def bench_extract_chain(args):
+    calls = []
+    for spread_year in range(1, engine.MAX_SPREAD_YEAR + 1):
+        grid, crown = engine.generate_yearly_spread_data(spread_year)
+        birth_card = engine.CARDS[spread_year % 52]
+        calls.append((grid, crown, birth_card, spread_year))
+    return measure(lambda: [engine.extract_chain(*call) for call in calls], len(calls), args.repeat * 5)
+
+@case("calculate_letter_data")
+def bench_letter_data(args):
+    birthdays = sample_birthdays(2000)
+    run = lambda: [engine.calculate_letter_data("Bench", y, m, d, "2026-03-15") for y, m, d in birthdays]
+    return measure(run, len(birthdays), args.repeat)
+
+# ====================== BATCH ======================
+
+def synthetic_csv(rows):
+    """A subscriber CSV with `rows` random birthdays, generated once and kept in DATA_DIR."""
+    path = os.path.join(DATA_DIR, f"subscribers-{rows}.csv")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        rng = random.Random(rows)
+        with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["first_name", "birth_date", "email", "target_month_year"])
+            for i in range(rows):
+                birth = datetime.date(rng.randint(1940, 2008), rng.randint(1, 12), rng.randint(1, 28))
+                writer.writerow([f"Sub{i}", birth.isoformat(), f"sub{i}@example.com", "2026-03"])
+        os.replace(path + ".tmp", path)
+    return path
+
+@case("batch_compute")
+def bench_batch(args):
+    from generate_letter import run_batch
+    path = synthetic_csv(args.subscribers)
+
+    def run():
+        with tempfile.TemporaryDirectory() as out:
+            with open(os.devnull, "w") as quiet:
+                stderr, sys.stderr = sys.stderr, quiet
+                try:
+                    run_batch(path, out, render=False, chunk_size=10000)
+                finally:
+                    sys.stderr = stderr
+    return measure(run, args.subscribers, 1)
+
+# ====================== PDF ======================
+
+SAMPLE = ("Cassidy", 1991, 2, 17)
+
+def sample_letter():
+    data = engine.calculate_letter_data(*SAMPLE, "2026-03-15")
+    return data, letters.compose_prose(data)
+
+_COLD_SCRIPT = """
+import time
+started = time.perf_counter()
+from app import engine, letters, pdf_generator
+data = engine.calculate_letter_data("Cassidy", 1991, 2, 17, "2026-03-15")
+pdf_generator.build_pdf(None, "2026-03", "Cassidy", letters.compose_prose(data), additional_data=data)
+print(time.perf_counter() - started)
+"""
+
+@case("build_pdf_cold")
+def bench_pdf_cold(args):
+    """First letter in a fresh process: imports, template/CSS/font loading and the render."""
+    require_weasyprint()
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, "-c", _COLD_SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                             check=True, env={**os.environ, "PDF_CACHE_DIR": ""})
+        runs.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"seconds": statistics.median(runs), "min": min(runs), "ops": 1, "repeat": args.repeat,
+            "ops_per_sec": round(1 / statistics.median(runs), 1)}
+
+@case("build_pdf_warm")
+def bench_pdf_warm(args):
+    require_weasyprint()
+    from app import pdf_generator
+    data, prose = sample_letter()
+    pdf_generator.warm_up()
+    pdf_generator.build_pdf(None, "2026-03", "Cassidy", prose, additional_data=data)
+    count = 5
+    run = lambda: [pdf_generator.build_pdf(None, "2026-03", "Cassidy", prose, additional_data=data) for _ in range(count)]
+    return measure(run, count, args.repeat)
+
+@case("build_pdfs_batch")
+def bench_pdfs_batch(args):
+    """Seconds per letter when a group of 16 letters is laid out as one document and split
+    (build_pdfs, as the batch command renders); compare with build_pdf_warm."""
+    require_weasyprint()
+    from app import pdf_generator
+    data, prose = sample_letter()
+    pdf_generator.warm_up()
+    count = 16
+    with tempfile.TemporaryDirectory() as out:
+        jobs = [(os.path.join(out, f"{i}.pdf"), "2026-03", f"Cassidy{i}", prose, data) for i in range(count)]
+        pdf_generator.build_pdfs(jobs)
+        return measure(lambda: pdf_generator.build_pdfs(jobs), count, args.repeat)
+
+# ====================== REQUEST PATH ======================
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+@case("request_path")
+def bench_request_path(args):
+    """POST /admin/generate-test end to end: engine, render pool and a Lob upload to the fake."""
+    require_weasyprint()
+    fake_port, server_port = free_port(), free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "PDF_CACHE_DIR": "", "JOBS_DB_PATH": os.path.join(tmp, "jobs.db"),
+               "LOB_API_BASE": f"http://127.0.0.1:{fake_port}/v1",
+               "TIKTOK_API_BASE": f"http://127.0.0.1:{fake_port}", "LOB_API_KEY": "bench"}
+        processes = [
+            subprocess.Popen([sys.executable, os.path.join(ROOT, "tools", "fake_services.py"), "--port", str(fake_port),
+                              "--latency", str(args.stand_in_latency), "--jitter", "0", "--lob-limit", "0"],
+                             cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+            subprocess.Popen([sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(server_port)],
+                             cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        ]
+        try:
+            wait_for(f"http://127.0.0.1:{fake_port}/stats")
+            wait_for(f"http://127.0.0.1:{server_port}/health")
+            session = requests.Session()
+            url = f"http://127.0.0.1:{server_port}/admin/generate-test"
+            birthdays = sample_birthdays(20, seed=1)
+
+            def run():
+                for y, m, d in birthdays:
+                    body = {"first_name": "Bench", "birth_date": f"{y}-{m:02d}-{d:02d}", "target_month": "2026-03"}
+                    session.post(url, json=body, timeout=60).raise_for_status()
+            run()  # first requests start the render workers' caches
+            return measure(run, len(birthdays), args.repeat)
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+# ====================== RUNNER ======================
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Rows of (case, baseline seconds, current seconds, % change, regressed) for cases in both."""
+    rows = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or "seconds" not in result or "seconds" not in base:
+            continue
+        change = (result["seconds"] - base["seconds"]) / base["seconds"] * 100
+        rows.append((name, base["seconds"], result["seconds"], change, change > threshold))
+    return rows
+
+def environment():
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.node(),
+            "cpus": os.cpu_count(), "recorded": datetime.datetime.now().isoformat(timespec="seconds")}
+
+def write_json(path, payload):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Analog Algorithm benchmarks.")
+    parser.add_argument("--cases", default=None, help=f"Comma-separated cases (default: all of {', '.join(CASES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (the median is reported)")
+    parser.add_argument("--subscribers", type=int, default=1_000_000, help="Rows in the synthetic batch CSV")
+    parser.add_argument("--stand-in-latency", type=float, default=0.0, help="Fake Lob latency in seconds for request_path")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--out", default=DEFAULT_RESULTS, help="Where to write this run's results")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slowdown in percent before failing")
+    args = parser.parse_args(argv)
+    # Measure rendering, not cache hits. Set here rather than at import, so importing this
+    # module (e.g. from the tests) leaves the cache alone; cases import app.pdf_cache later.
+    os.environ.setdefault("PDF_CACHE_DIR", "")
+
+    names = args.cases.split(",") if args.cases else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        try:
+            results[name] = CASES[name](args)
+            r = results[name]
+            print(f"{name:30s} {r['seconds'] * 1e6:14.2f} us/op  ({r['ops_per_sec']} ops/s, min {r['min'] * 1e6:.2f} us)")
+        except (Skip, ImportError, OSError) as e:  # e.g. WeasyPrint without its system libraries
+            results[name] = {"skipped": str(e) if isinstance(e, Skip) else f"{type(e).__name__}: {e}"}
+            print(f"{name:30s} skipped: {e}")
+    payload = {"environment": environment(), "cases": results}
+    write_json(args.out, payload)
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)["cases"]
+            payload["cases"] = previous | {name: r for name, r in results.items() if "seconds" in r}
+        write_json(args.baseline, payload)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["cases"]
+    rows = compare(results, baseline, args.threshold)
+    print(f"\nvs baseline (threshold {args.threshold:g}%):")
+    for name, base, current, change, regressed in rows:
+        flag = "REGRESSED" if regressed else "ok"
+        print(f"{name:30s} {base * 1e6:12.2f} -> {current * 1e6:12.2f} us/op  {change:+7.1f}%  {flag}")
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"Regressed beyond {args.threshold:g}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
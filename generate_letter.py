@@ -1,123 +1,361 @@
-# generate_letter.py - Clean Launch Version with fixed birth card lookup
+# generate_letter.py - Single letter or streaming monthly batch, built on app.engine
 
-from datetime import datetime
-from weasyprint import HTML
+import argparse
+import csv
+import logging
 import os
+import re
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
 
-# ====================== CORE ENGINE ======================
-YEAR_0 = ['7♥','6♥','5♥','4♥','3♥','2♥','A♥','A♣','K♥','Q♥','J♥','10♥','9♥','8♥',
-          '8♣','7♣','6♣','5♣','4♣','3♣','2♣','2♦','A♦','K♣','Q♣','J♣','10♣','9♣',
-          '9♦','8♦','7♦','6♦','5♦','4♦','3♦','3♠','2♠','A♠','K♦','Q♦','J♦','10♦',
-          '10♠','9♠','8♠','7♠','6♠','5♠','4♠','K♠','Q♠','J♠']
-
-P = [37,34,17,42,24,7,4,5,43,27,10,47,30,0,14,51,21,18,1,38,8,22,6,44,41,11,48,31,32,15,12,35,
-     19,2,39,40,23,20,45,28,25,50,9,46,16,13,36,33,3,49,29,26]
-
-def generate_spread(year_num):
-    flat = YEAR_0[:]
-    for _ in range(year_num):
-        flat = [flat[i] for i in P]
-    return flat
-
-def get_left_pos(pos):
-    if pos >= 49:
-        return {51:50, 50:49, 49:49}.get(pos, pos)
-    row, col = divmod(pos, 7)
-    col -= 1
-    if col >= 0: return row * 7 + col
-    new_row = row + 1
-    if new_row < 7: return new_row * 7 + 6
-    return 51
-
-def extract_seven(flat, birth_pos):
-    current = birth_pos
-    extracted = []
-    for _ in range(7):
-        current = get_left_pos(current)
-        extracted.append(flat[current])
-    return extracted
-
-# Birth card via solar value formula (Olney Richmond, 1893)
-# solar_value = 55 - (month * 2 + day)
-# Maps each day of the year to one of 52 cards + Joker (Dec 31)
-def get_birth_card(birth_date):
-    m, d = birth_date.month, birth_date.day
-    solar_value = 55 - (m * 2 + d)
-    if solar_value <= 0:
-        return "Joker"
-    suits = ['♥', '♣', '♦', '♠']
-    ranks = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-    suit = suits[(solar_value - 1) // 13]
-    rank = ranks[(solar_value - 1) % 13]
-    return f"{rank}{suit}"
-
-def get_suit_realm(card):
-    if '♥' in card: return "Emotional"
-    if '♣' in card: return "Behavioral"
-    if '♦' in card: return "Material"
-    return "Intellectual"
-
-def get_rank_archetype(card):
-    r = card.replace('♥','').replace('♣','').replace('♦','').replace('♠','')
-    arch = {'A':'Pioneer','2':'Partner','3':'Creator','4':'Builder','5':'Disruptor','6':'Server',
-            '7':'Seeker','8':'Commander','9':'Completer','10':'Master','J':'Messenger',
-            'Q':'Sovereign','K':'Authority'}
-    return arch.get(r, r)
-
-# ====================== GENERATE LETTER ======================
-def generate_letter(first_name, birth_str, target_month_year="2026-03"):
-    birth_date = datetime.strptime(birth_str, "%Y-%m-%d")
-    target_date = datetime.strptime(f"{target_month_year}-15", "%Y-%m-%d")
-
-    age = target_date.year - birth_date.year - ((target_date.month, target_date.day) < (birth_date.month, birth_date.day))
-    spread_num = (max(age, 0) % 90) + 1
-
-    flat = generate_spread(spread_num)
-    birth_card = get_birth_card(birth_date)
-    birth_pos = flat.index(birth_card)
-    seven = extract_seven(flat, birth_pos)
-
-    last_bday = target_date.replace(month=birth_date.month, day=birth_date.day)
-    if last_bday > target_date:
-        last_bday = last_bday.replace(year=last_bday.year - 1)
-    days_since = (target_date - last_bday).days + 1
-    period_idx = min((days_since - 1) // 52, 6)
-    period_card = seven[period_idx]
-    planet = ["Mercury","Venus","Mars","Jupiter","Saturn","Uranus","Neptune"][period_idx]
-
-    letter_body = f"""You're already doing that thing again.
-
-The pattern running right now is the {get_rank_archetype(period_card)} in the {get_suit_realm(period_card).lower()} domain, activated through {planet.lower()} perception.
-
-The uncomfortable line: this is costing you more than you're admitting.
-
-The question that lingers: what would a single day look like if you measured it by what you kept instead of what you shipped?"""
-
-    html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        @page {{ size: letter portrait; margin: 0.75in; }}
-        body {{ font-family: 'Inter', sans-serif; line-height: 1.75; font-size: 11.2pt; color: #1f2937; }}
-        .header {{ text-align: center; font-size: 13pt; color: #78350f; margin-bottom: 40px; letter-spacing: 3px; }}
-        h1 {{ font-family: 'Playfair Display', serif; font-size: 26pt; text-align: center; margin: 30px 0 50px; color: #111827; }}
-        .footer {{ margin-top: 70px; text-align: center; font-size: 9pt; color: #6b7280; }}
-    </style>
-</head>
-<body>
-    <div class="header">&spades; &hearts; &clubs; &diams;   THE ANALOG ALGORITHM</div>
-    <h1>Dear {first_name},</h1>
-    {letter_body.replace('\n', '<br><br>')}
-    <div class="footer">
-        Confidential to {first_name} • {datetime.strptime(target_month_year, "%Y-%m").strftime("%B %Y")} • The Analog Algorithm
-    </div>
-</body>
-</html>"""
-
-    filename = f"analog-algo-{first_name.lower()}-{target_month_year}.pdf"
-    HTML(string=html).write_pdf(filename)
+from app import dates, engine, letters, metrics, pdf_cache
+from app.dispatcher import LobDispatcher
+from app.letters import ReadingPlanner
+from app.journal import Journal, subscriber_key
+
+DEFAULT_MONTH = "2026-03"
+RESULT_FIELDS = ["row", "first_name", "birth_date", "target_month", "birth_card", "period_card", "planet", "pdf", "lob_id", "status", "error", "mail_seconds"]
+ADDRESS_FIELDS = ("address_line1", "city", "state", "zip_code")
+
+logger = logging.getLogger(__name__)
+
+# ====================== SINGLE LETTER ======================
+
+def letter_filename(first_name, target_month_year, row=None):
+    slug = re.sub(r"[^a-z0-9]+", "-", first_name.lower()).strip("-") or "subscriber"
+    prefix = f"analog-algo-{row:07d}-" if row is not None else "analog-algo-"
+    return f"{prefix}{slug}-{target_month_year}.pdf"
+
+def _pdf_generator():
+    """app.pdf_generator, imported on first use: it loads WeasyPrint (and its system libraries),
+    which --no-render runs never need."""
+    from app import pdf_generator
+    return pdf_generator
+
+def warm_up_renderer():
+    """Render process initializer."""
+    _pdf_generator().warm_up()
+
+def generate_letter(first_name, birth_str, target_month_year=DEFAULT_MONTH, output_dir="."):
+    b_year, b_month, b_day = map(int, birth_str.split("-"))
+    data = engine.calculate_letter_data(first_name, b_year, b_month, b_day, f"{target_month_year}-15")
+    if "error" in data:
+        raise ValueError(data["error"])
+    filename = os.path.join(output_dir, letter_filename(first_name, target_month_year))
+    _pdf_generator().build_pdf(filename, target_month_year, first_name, letters.compose_prose(data), additional_data=data)
     print(f"✅ Generated: {filename}")
+    return filename
+
+# ====================== BATCH ======================
+
+def read_chunks(csv_path, chunk_size):
+    """Streams the subscriber CSV as lists of at most chunk_size rows."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def compute_chunk(rows, first_row, default_month):
+    """Runs the batch engine over one chunk; yields (subscriber, letter data, error)."""
+    parsed = []
+    for offset, row in enumerate(rows):
+        number = first_row + offset
+        sub = {
+            "row": number,
+            "first_name": (row.get("first_name") or "").strip(),
+            "birth_date": (row.get("birth_date") or "").strip(),
+            "target_month": (row.get("target_month_year") or "").strip() or default_month,
+        }
+        sub["key"] = subscriber_key(row, sub["target_month"])
+        sub["address"] = mailing_address(row)
+        if None in row:  # csv.DictReader puts fields past the header under None
+            yield sub, None, f"{len(row[None])} field(s) more than the header"
+            continue
+        try:
+            b_year, b_month, b_day = map(int, sub["birth_date"].split("-"))
+        except ValueError:
+            yield sub, None, f"invalid birth_date {sub['birth_date']!r}"
+            continue
+        target = f"{sub['target_month']}-15"
+        try:
+            dates.parse_target_date(target)
+        except ValueError:
+            yield sub, None, f"invalid target_month {sub['target_month']!r}"
+            continue
+        parsed.append((sub, b_year, b_month, b_day, target))
+    if not parsed:
+        return
+    subs, years, months, days, targets = zip(*parsed)
+    batch = engine.calculate_letter_data_batch(years, months, days, targets)
+    for i, sub in enumerate(subs):
+        try:
+            data = engine.letter_data_from_batch(batch, i, sub["first_name"])
+        except IndexError:
+            yield sub, None, "spread year too short for the active period"
+            continue
+        if "error" in data:
+            yield sub, None, data["error"]
+        else:
+            yield sub, data, None
+
+def mailing_address(row):
+    """Lob address from the optional CSV columns, or None if the row has no address."""
+    if not all((row.get(field) or "").strip() for field in ADDRESS_FIELDS):
+        return None
+    address = {field: row[field].strip() for field in ADDRESS_FIELDS}
+    address["name"] = (row.get("name") or row.get("first_name") or "").strip()
+    return address
+
+def render_letter(pdf_path, target_month, first_name, prose, data):
+    """Renders one letter and returns its path."""
+    _pdf_generator().build_pdf(pdf_path, target_month, first_name, prose, additional_data=data)
+    return pdf_path
+
+def render_group(prose, people):
+    """Process pool entry point: renders letters that share one prose body.
+
+    people is a list of (pdf_path, target_month, first_name, data). Returns (pdf_path, error)
+    per person plus a dict of the group's render seconds and PDF cache hits/misses (the
+    cache counters live in the worker process). The group is laid out as one batch document
+    and split into per-letter files; if that fails, letters are retried one by one so one
+    bad letter does not fail its group.
+    """
+    started = time.perf_counter()
+    cache = pdf_cache.get_cache()
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+    def render_stats():
+        stats = {"seconds": time.perf_counter() - started, "cache_hits": 0, "cache_misses": 0}
+        if cache is not None:
+            stats.update(cache_hits=cache.hits - hits, cache_misses=cache.misses - misses)
+        return stats
+
+    try:
+        _pdf_generator().build_pdfs([(pdf_path, target_month, first_name, prose, data)
+                                     for pdf_path, target_month, first_name, data in people])
+        return [(pdf_path, None) for pdf_path, _, _, _ in people], render_stats()
+    except Exception as e:
+        logger.warning(f"Batch render of {len(people)} letters failed; rendering them one by one ({e!r})")
+    results = []
+    for pdf_path, target_month, first_name, data in people:
+        try:
+            results.append((render_letter(pdf_path, target_month, first_name, prose, data), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results, render_stats()
+
+def result_row(sub, data=None, pdf="", lob_id="", status="ok", error="", mail_seconds=""):
+    period = (data or {}).get("period", {})
+    return {
+        **{field: sub[field] for field in ("row", "first_name", "birth_date", "target_month")},
+        "birth_card": (data or {}).get("birth_card", ""),
+        "period_card": period.get("card", ""),
+        "planet": period.get("planet", ""),
+        "pdf": pdf,
+        "lob_id": lob_id or "",
+        "status": status,
+        "error": error,
+        "mail_seconds": mail_seconds,
+    }
+
+def drop_failed_results(results_path):
+    """Removes "failed" lines from an earlier run's results.csv before a resume.
+
+    A resumed run retries those letters and writes their new outcome, so every row ends up
+    in results.csv once. Lines of letters that succeeded or were skipped stay, and the
+    journal keeps the rerun from writing them again.
+    """
+    tmp_path = f"{results_path}.tmp"
+    with open(results_path, newline="", encoding="utf-8") as src, \
+            open(tmp_path, "w", newline="", encoding="utf-8") as dst:
+        writer = csv.DictWriter(dst, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(row for row in csv.DictReader(src) if row.get("status") != "failed")
+    os.replace(tmp_path, results_path)
+
+def run_batch(csv_path, output_dir, default_month=DEFAULT_MONTH, workers=None, chunk_size=1000,
+              render=True, mail=False, journal_path=None, group_size=16):
+    """Streams csv_path through the engine, a PDF process pool and (optionally) Lob.
+
+    Only one chunk of rows and a bounded number of in-flight renders are held at a time, and
+    every outcome is appended to results.csv as it completes, so memory stays flat no matter
+    how large the file is. Each completed stage is written to the journal, so a rerun after a
+    crash skips subscribers that were already rendered (and mailed, with --mail).
+
+    Within each chunk subscribers are grouped by reading (see ReadingPlanner): prose is
+    composed once per group and each render task carries it once for up to group_size people.
+    """
+    if mail and not render:
+        raise ValueError("mail=True needs render=True: only rendered letters can be mailed")
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    planner = ReadingPlanner()
+    final_stage = "mailed" if mail else "rendered" if render else "computed"
+    stats = {"rows": 0, "resumed": 0, "rendered": 0, "mailed": 0, "failed": 0, "skipped": 0, "groups": 0}
+    started = time.perf_counter()
+
+    results_path = os.path.join(output_dir, "results.csv")
+    resuming = os.path.exists(results_path)
+    if resuming:
+        drop_failed_results(results_path)
+    with open(results_path, "a", newline="", encoding="utf-8") as out, \
+            Journal(journal_path or os.path.join(output_dir, "journal.jsonl")) as journal, \
+            ProcessPoolExecutor(max_workers=workers, initializer=warm_up_renderer if render else None) as pool:
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+        if not resuming:
+            writer.writeheader()
+        in_flight = {}
+        dispatcher = LobDispatcher() if mail else None
+
+        def finish(sub, data, pdf_path):
+            if not mail:
+                writer.writerow(result_row(sub, data, pdf=pdf_path))
+                return
+            if not sub["address"]:
+                writer.writerow(result_row(sub, data, pdf=pdf_path, status="failed", error="no mailing address"))
+                stats["failed"] += 1
+                metrics.LETTERS_FAILED.inc(stage="mail")
+                return
+            dispatcher.submit(sub["key"], pdf_path, sub["address"], context=(sub, data, pdf_path))
+            collect_mail()
+
+        def collect_mail(wait=False):
+            """Writes out letters the dispatcher has finished; wait=True waits for all of them."""
+            for result in dispatcher.results(wait) if dispatcher else ():
+                sub, data, pdf_path = result.context
+                mail_seconds = round(result.seconds, 3)
+                if result.error:
+                    writer.writerow(result_row(sub, data, pdf=pdf_path, status="failed", error=result.error, mail_seconds=mail_seconds))
+                    stats["failed"] += 1
+                    metrics.LETTERS_FAILED.inc(stage="mail")
+                    continue
+                metrics.STAGE_SECONDS.observe(result.seconds, stage="mail")
+                metrics.LETTERS_MAILED.inc()
+                journal.record(sub["key"], "mailed", lob_id=result.lob_id, mail_seconds=mail_seconds)
+                writer.writerow(result_row(sub, data, pdf=pdf_path, lob_id=result.lob_id, mail_seconds=mail_seconds))
+                stats["mailed"] += 1
+
+        def drain(return_when):
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                members = in_flight.pop(future)
+                try:
+                    outcomes, render_stats = future.result()
+                except Exception as e:
+                    outcomes, render_stats = [(None, str(e))] * len(members), None
+                if render_stats:
+                    metrics.PDF_CACHE_LOOKUPS.inc(render_stats["cache_hits"], result="hit")
+                    metrics.PDF_CACHE_LOOKUPS.inc(render_stats["cache_misses"], result="miss")
+                for (sub, data), (pdf_path, error) in zip(members, outcomes):
+                    if error:
+                        writer.writerow(result_row(sub, data, status="failed", error=error))
+                        stats["failed"] += 1
+                        metrics.LETTERS_FAILED.inc(stage="render")
+                        continue
+                    journal.record(sub["key"], "rendered", pdf=pdf_path)
+                    stats["rendered"] += 1
+                    metrics.STAGE_SECONDS.observe(render_stats["seconds"] / len(members), stage="render")
+                    metrics.LETTERS_RENDERED.inc()
+                    finish(sub, data, pdf_path)
+
+        next_row = 1
+        for rows in read_chunks(csv_path, chunk_size):
+            to_render = []
+            with metrics.BATCH_CHUNK_SECONDS.time(stage="compute"):
+                computed = list(compute_chunk(rows, next_row, default_month))
+            for sub, data, error in computed:
+                stats["rows"] += 1
+                key = sub["key"]
+                if error:
+                    if (journal.get(key) or {}).get("skipped") == error:
+                        stats["resumed"] += 1  # its results.csv line is from an earlier run
+                        continue
+                    writer.writerow(result_row(sub, status="skipped", error=error))
+                    journal.record(key, "skipped", skipped=error)
+                    stats["skipped"] += 1
+                    continue
+                if journal.done(key, final_stage):
+                    stats["resumed"] += 1
+                    continue
+                if not journal.done(key, "computed"):
+                    journal.record(key, "computed", birth_card=data["birth_card"], period_card=data["period"]["card"])
+                if not render:
+                    writer.writerow(result_row(sub, data, status="computed"))
+                    continue
+                previous = journal.get(key)
+                if journal.done(key, "rendered") and os.path.exists(previous.get("pdf", "")):
+                    finish(sub, data, previous["pdf"])
+                    continue
+                to_render.append((sub, data))
+
+            with metrics.BATCH_CHUNK_SECONDS.time(stage="prose"):
+                groups = planner.plan(to_render)
+            for _, prose, members in groups:
+                for start in range(0, len(members), group_size):
+                    batch = members[start:start + group_size]
+                    people = [
+                        (os.path.join(output_dir, letter_filename(sub["first_name"], sub["target_month"], sub["row"])),
+                         sub["target_month"], sub["first_name"], data)
+                        for sub, data in batch
+                    ]
+                    in_flight[pool.submit(render_group, prose, people)] = batch
+                    if len(in_flight) >= max_in_flight:
+                        drain(FIRST_COMPLETED)
+            next_row += len(rows)
+            collect_mail()
+            out.flush()
+            journal.sync()
+            elapsed = time.perf_counter() - started
+            print(f"{stats['rows']} rows ({stats['rows'] / elapsed:.0f} rows/sec)", file=sys.stderr)
+        if in_flight:
+            drain(ALL_COMPLETED)
+        collect_mail(wait=True)
+        if dispatcher:
+            dispatcher.close()
+            stats["throttled"] = dispatcher.stats["throttled"]
+
+    elapsed = time.perf_counter() - started
+    stats["groups"] = planner.distinct_readings
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["rows"] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Analog Algorithm letters.")
+    parser.add_argument("--csv", help="Subscriber CSV (first_name, birth_date, target_month_year); omit for a single sample letter")
+    parser.add_argument("--out", default="letters", help="Output directory for PDFs and results.csv")
+    parser.add_argument("--month", default=DEFAULT_MONTH, help="Letter month (YYYY-MM) for rows without target_month_year")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows read and computed per chunk")
+    parser.add_argument("--no-render", action="store_true", help="Compute readings only; skip PDF rendering")
+    parser.add_argument("--mail", action="store_true", help="Mail rendered letters via Lob (needs address_line1, city, state, zip_code columns)")
+    parser.add_argument("--journal", default=None, help="Job journal used to resume interrupted runs (default: <out>/journal.jsonl)")
+    parser.add_argument("--metrics-out", default=None, help="Write stage timings and letter counters (Prometheus text format) here at exit")
+    args = parser.parse_args(argv)
+    if args.no_render and args.mail:
+        parser.error("--mail needs rendered letters; drop --no-render")
+
+    if not args.csv:
+        generate_letter("Cassidy", "1991-02-17", args.month)
+        return
+
+    try:
+        stats = run_batch(args.csv, args.out, args.month, args.workers, args.chunk_size,
+                          render=not args.no_render, mail=args.mail, journal_path=args.journal)
+    finally:
+        if args.metrics_out:
+            metrics.REGISTRY.write(args.metrics_out)
+    print(
+        f"Done: {stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec); "
+        f"{stats['resumed']} already done, {stats['rendered']} rendered, {stats['mailed']} mailed, "
+        f"{stats['skipped']} skipped, {stats['failed']} failed; {stats['groups']} distinct readings"
+    )
 
 if __name__ == "__main__":
-    generate_letter("Cassidy", "1991-02-17", "2026-03")
\ No newline at end of file
+    main()
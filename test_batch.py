@@ -0,0 +1,73 @@
+import csv
+import io
+
+import pytest
+
+from app.journal import subscriber_key
+from generate_letter import compute_chunk
+
+
+def test_row_with_extra_fields_is_skipped():
+    rows = list(csv.DictReader(io.StringIO(
+        "first_name,birth_date,target_month_year\n"
+        "D,1991-02-17,2026-03\n"
+        "E,1980-01-01,2026-03,extra\n"
+    )))
+    assert subscriber_key(rows[1], "2026-03") != subscriber_key(rows[0], "2026-03")
+    results = {sub["row"]: (data, error) for sub, data, error in compute_chunk(rows, 1, "2026-03")}
+    assert results[1][0] and results[1][1] is None
+    assert results[2] == (None, "1 field(s) more than the header")
+
+
+CSV = (
+    "first_name,birth_date,target_month_year\n"
+    "Ada,1991-02-17,2026-03\n"
+    "Bo,not-a-date,2026-03\n"
+    "Cy,1980-01-01,2026-03,extra\n"
+    "Di,1975-07-04,2026-03\n"
+    "Ed,2001-11-30,2026-03\n"
+)
+
+
+def read_results(out):
+    with open(out / "results.csv", newline="", encoding="utf-8") as f:
+        return sorted((row["row"], row["status"]) for row in csv.DictReader(f))
+
+
+def test_compute_only_batch_resumes_without_duplicate_lines(tmp_path, monkeypatch):
+    import generate_letter
+
+    source = tmp_path / "subscribers.csv"
+    source.write_text(CSV, encoding="utf-8")
+    out = tmp_path / "out"
+    read_chunks = generate_letter.read_chunks
+
+    def crash_after_first_chunk(path, chunk_size):
+        chunks = read_chunks(path, chunk_size)
+        yield next(chunks)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(generate_letter, "read_chunks", crash_after_first_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        generate_letter.run_batch(str(source), str(out), workers=1, chunk_size=3, render=False)
+    assert read_results(out) == [("1", "computed"), ("2", "skipped"), ("3", "skipped")]
+
+    monkeypatch.setattr(generate_letter, "read_chunks", read_chunks)
+    stats = generate_letter.run_batch(str(source), str(out), workers=1, chunk_size=3, render=False)
+    assert stats["resumed"] == 3 and stats["skipped"] == 0
+    assert read_results(out) == [("1", "computed"), ("2", "skipped"), ("3", "skipped"), ("4", "computed"), ("5", "computed")]
+
+    stats = generate_letter.run_batch(str(source), str(out), workers=1, chunk_size=3, render=False)
+    assert stats["resumed"] == 5 and len(read_results(out)) == 5
+
+
+def test_resume_drops_failed_lines_that_will_be_retried(tmp_path):
+    from generate_letter import RESULT_FIELDS, drop_failed_results
+
+    path = tmp_path / "results.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows([{"row": 1, "status": "ok"}, {"row": 2, "status": "failed", "error": "Lob 502"}])
+    drop_failed_results(str(path))
+    assert read_results(tmp_path) == [("1", "ok")]
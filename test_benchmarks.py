@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.bench import compare
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"fast": {"seconds": 1.0}, "slow": {"seconds": 1.0}, "gone": {"seconds": 1.0}}
+    results = {"fast": {"seconds": 0.75}, "slow": {"seconds": 1.25}, "new": {"seconds": 1.0},
+               "pdf": {"skipped": "WeasyPrint unavailable"}}
+    rows = {name: (change, regressed) for name, _, _, change, regressed in compare(results, baseline, threshold=20)}
+    assert rows == {"fast": (-25.0, False), "slow": (25.0, True)}
+
+
+
+def test_importing_bench_leaves_the_pdf_cache_enabled():
+    env = {k: v for k, v in os.environ.items() if k != "PDF_CACHE_DIR"}
+    out = subprocess.run([sys.executable, "-c", "import os, benchmarks.bench; print(os.getenv('PDF_CACHE_DIR'))"],
+                         env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "None"
@@ -0,0 +1,40 @@
+import http.server
+import threading
+
+from app import http_client
+from app.dispatcher import LobDispatcher
+
+ADDRESS = {"name": "Cassidy", "address_line1": "123 Mystic Lane", "city": "Portland", "state": "OR", "zip_code": "97204"}
+
+
+def test_non_json_5xx_is_retried_once_per_attempt(monkeypatch):
+    posts = []
+
+    class BadGateway(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            posts.append(self.headers.get("Idempotency-Key"))
+            body = b"<html><body>502 Bad Gateway</body></html>"
+            self.send_response(502)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), BadGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("LOB_API_KEY", "test")
+    monkeypatch.setattr(http_client, "LOB_API_BASE", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(http_client, "BACKOFF", 0.001)
+    try:
+        dispatcher = LobDispatcher(rate=100, retries=2)
+        dispatcher.submit("letter-1", b"%PDF", ADDRESS)
+        [result] = list(dispatcher.results(wait=True))
+    finally:
+        server.shutdown()
+    assert result.status == "failed" and result.attempts == 3
+    assert result.error == "Lob 502: <html><body>502 Bad Gateway</body></html>"
+    assert posts == ["letter-1"] * 3  # no hidden retries inside the HTTP session
@@ -0,0 +1,152 @@
+import numpy as np
+
+from app import engine
+
+
+def naive_spread(spread_year):
+    flat = list(engine.YEAR_0)
+    for _ in range(spread_year):
+        flat = [flat[i] for i in engine.P]
+    return flat
+
+
+def naive_chain(flat, birth_card, count):
+    # Step left along each row, drop to the next row at col 0, pass through the crown
+    # 2 -> 1 -> 0 and wrap back to Mercury col 6.
+    slot = flat.index(birth_card)
+    chain = []
+    while len(chain) < count:
+        if slot >= 49:
+            slot = slot - 1 if slot > 49 else 6
+        elif slot % 7:
+            slot -= 1
+        elif slot < 42:
+            slot += 13
+        else:
+            slot = 51
+        chain.append(flat[slot])
+    return chain
+
+
+def test_spread_store_matches_repeated_shuffle():
+    for spread_year in range(engine.MAX_SPREAD_YEAR + 1):
+        flat = naive_spread(spread_year)
+        assert list(engine.get_spread(spread_year)) == flat
+        for slot, card in enumerate(flat):
+            assert engine.find_card(spread_year, card) == slot
+
+
+def test_spread_store_wraps_past_cycle():
+    assert engine.get_spread(engine.SPREAD_CYCLE) == engine.get_spread(0)
+    assert list(engine.get_spread(95)) == naive_spread(95)
+
+
+def test_chain_matches_grid_walk():
+    for spread_year in range(1, 120):
+        flat = naive_spread(spread_year)
+        grid, crown = engine.generate_yearly_spread_data(spread_year)
+        for card in flat:
+            chain = naive_chain(flat, card, spread_year)
+            names = [engine.CARDS[c] for c in chain]
+            assert engine.extract_chain(grid, crown, engine.CARDS[card], spread_year) == names
+            period_idx = min(spread_year - 1, 6)
+            assert engine.get_chain_cards(spread_year, card, period_idx) == (
+                chain[period_idx],
+                chain[-1],
+                chain[7] if spread_year >= 8 else engine.NO_CARD,
+                chain[8] if spread_year >= 9 else engine.NO_CARD,
+            )
+
+
+def test_chain_walks_grids_not_taken_from_the_store():
+    flat = naive_spread(3)[::-1]  # some other permutation of the deck
+    grid = {row: [engine.CARDS[c] for c in flat[i * 7:i * 7 + 7]] for i, row in enumerate(engine.ROWS)}
+    crown = [engine.CARDS[c] for c in flat[engine.CROWN_START:]]
+    for card in flat:
+        for spread_year in (1, 9, 60):
+            names = [engine.CARDS[c] for c in naive_chain(flat, card, spread_year)]
+            assert engine.extract_chain(grid, crown, engine.CARDS[card], spread_year) == names
+
+
+def test_interpretation_tables():
+    assert engine.get_rank_archetype("10♥") == engine.get_rank_archetype(engine.CARD_IDS["10♥"]) == "Master"
+    assert engine.get_suit_realm("Q♦") == engine.get_suit_realm(engine.CARD_IDS["Q♦"]) == "Material"
+    assert engine.get_rank_archetype("") == engine.get_suit_realm(None) == "Unknown"
+    card_id = np.int8(engine.CARD_IDS["Q♦"])  # IDs read from the batch engine's arrays
+    assert engine.get_suit_realm(card_id) == "Material" and engine.get_rank_archetype(card_id) == "Sovereign"
+    assert engine.card_name(engine.NO_CARD) is None
+
+
+def test_feb_29_birthday_counts_as_mar_1_in_common_years():
+    import datetime
+
+    # Common year: the birthday falls on Mar 1, so Feb 28 is still the previous personal year
+    assert engine.get_spread_year(2, 29, 2000, datetime.date(2025, 2, 28))[0] == 24
+    age, days_since, _, last_bday = engine.get_spread_year(2, 29, 2000, datetime.date(2025, 3, 1))
+    assert (age, days_since, last_bday) == (25, 1, datetime.date(2025, 3, 1))
+    # Leap year: the real birthday is used
+    age, days_since, _, last_bday = engine.get_spread_year(2, 29, 2000, datetime.date(2024, 3, 1))
+    assert (age, days_since, last_bday) == (24, 2, datetime.date(2024, 2, 29))
+
+
+def test_reference_reading():
+    data = engine.calculate_letter_data("Cassidy", 1991, 2, 17, "2026-02-21")
+    assert data["spread_year"] == 36
+    assert data["period"]["card"] == "7♦"
+    assert data["year_long"] == {
+        "long_range": "4♦",
+        "pluto": "3♦",
+        "result": "K♦",
+        "displacement": "6♦",
+        "environment": "8♠",
+    }
+
+
+def test_batch_matches_scalar():
+    import numpy as np
+
+    rows = [(year, month, day) for month in range(1, 13) for day in range(1, 32) for year in (1930, 1970, 2021, 2026)]
+    years, months, days = map(np.array, zip(*rows))
+    for target in ("2026-03-15", "2024-02-29", "2025-02-28", "2027-01-01"):
+        batch = engine.calculate_letter_data_batch(years, months, days, target)
+        for i, (year, month, day) in enumerate(rows):
+            try:
+                expected = engine.calculate_letter_data("x", year, month, day, target)
+            except IndexError:
+                expected = IndexError
+            try:
+                actual = engine.letter_data_from_batch(batch, i, "x")
+            except IndexError:
+                actual = IndexError
+            assert actual == expected, (year, month, day, target)
+
+
+def test_reading_table_matches_spreads(tmp_path):
+    path = engine.build_reading_table(str(tmp_path / "readings.bin"))
+    table = engine.load_reading_table(path)
+    records = engine.np.frombuffer(table, dtype=engine.np.uint8, offset=engine._TABLE_HEADER_SIZE)
+    records = records.reshape(len(engine.CARDS), engine.MAX_SPREAD_YEAR + 1, -1)
+    for card_id in range(len(engine.CARDS)):
+        for spread_year in range(1, engine.MAX_SPREAD_YEAR + 1):
+            chain = engine.get_chain(spread_year, card_id, spread_year)
+            disp, env = engine.displacement_environment(spread_year, card_id)
+            if card_id in engine.NO_DISP_ENV:
+                disp = env = engine.NO_CARD
+            missing = engine.NO_CARD
+            expected = [chain[-1], chain[7] if spread_year >= 8 else missing, chain[8] if spread_year >= 9 else missing, disp, env]
+            expected += [chain[i] if i < spread_year else missing for i in range(7)]
+            assert [engine._TABLE_IDS[b] for b in records[card_id, spread_year]] == expected
+
+
+def test_unusable_reading_table_is_tried_once(monkeypatch):
+    calls = []
+    def fail(path=None):
+        calls.append(path)
+        raise OSError("read-only file system")
+    monkeypatch.setattr(engine, "load_reading_table", fail)
+    monkeypatch.setattr(engine, "READING_TABLE_PATH", "/proc/nonexistent/readings.bin")
+    monkeypatch.setattr(engine, "_reading_table", None)
+    first = engine.calculate_letter_data("x", 1991, 2, 17, "2026-02-21")
+    assert engine.calculate_letter_data("x", 1991, 2, 17, "2026-02-21") == first
+    assert engine.get_reading_table() is None
+    assert len(calls) == 1
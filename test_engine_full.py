@@ -40,10 +40,57 @@ This PDF proves the engine is integrated correctly.
     pdf_path = os.path.join(os.getcwd(), filename)
     
     try:
-        pdf_generator.build_pdf(pdf_path, "MARCH 2026", first_name, content)
+        pdf_generator.build_pdf(pdf_path, "2026-03", first_name, content)
         print(f"SUCCESS: PDF created at {pdf_path}")
     except Exception as e:
         print(f"FAILURE: PDF generation failed: {e}")
 
+def test_degraded_fonts_bypass_the_pdf_cache(tmp_path, monkeypatch):
+    from app import pdf_cache
+    real_css = pdf_generator.CSS
+
+    def css(url=None, **kwargs):
+        if url is not None:
+            raise OSError("Google Fonts unreachable")
+        return real_css(**kwargs)
+
+    monkeypatch.setattr(pdf_generator, "CSS", css)
+    monkeypatch.setattr(pdf_generator, "fonts_bundled", lambda: False)
+    monkeypatch.setattr(pdf_generator, "_fonts", None)
+    cache = pdf_cache.PDFCache(str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "get_cache", lambda: cache)
+    assert pdf_generator.cache_version() is None
+    assert pdf_generator.build_pdf(None, "2026-03", "Cassidy", "Text.").startswith(b"%PDF")
+    assert not os.listdir(tmp_path)  # a generic-face render is never cached
+
+    monkeypatch.setattr(pdf_generator, "OFFLINE", True)
+    try:
+        pdf_generator.cache_version()
+    except RuntimeError as e:
+        assert "PDF_OFFLINE" in str(e)
+    else:
+        raise AssertionError("PDF_OFFLINE without bundled fonts must not render")
+
+def test_batch_document_manifest_and_split(tmp_path):
+    letters = [("2026-03", name, "Short letter.", None) for name in ("Ada", "Bo", "Cy")]
+    letters[1] = ("2026-03", "Bo", "\n".join(["A long paragraph of prose. " * 40] * 12), None)
+    pdf, manifest = pdf_generator.build_pdf_batch(None, letters)
+    assert pdf.startswith(b"%PDF")
+    assert [entry["first_name"] for entry in manifest] == ["Ada", "Bo", "Cy"]
+    assert manifest[0]["first_page"] == 1
+    assert manifest[1]["last_page"] > manifest[1]["first_page"]  # long prose runs on, not clipped
+    assert all(a["last_page"] + 1 == b["first_page"] for a, b in zip(manifest, manifest[1:]))
+
+    paths = [str(tmp_path / f"{letter[1]}.pdf") for letter in letters]
+    pdf_generator.build_pdfs([(path, *letter) for path, letter in zip(paths, letters)])
+    assert all(open(path, "rb").read().startswith(b"%PDF") for path in paths)
+
+def test_spooled_batch_spills_past_max_memory():
+    letters = [("2026-03", f"Reader{i}", "Short letter.", None) for i in range(3)]
+    buffer, manifest = pdf_generator.spool_pdf_batch(letters, max_memory=16)
+    with buffer:
+        assert buffer._rolled  # written through to a temp file, not held in memory
+        assert buffer.read(4) == b"%PDF" and len(manifest) == 3
+
 if __name__ == "__main__":
     test_full_cycle()
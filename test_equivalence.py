@@ -0,0 +1,15 @@
+from tools import equivalence, reference_engine
+
+
+def test_optimized_engine_matches_golden_readings():
+    meta, records = equivalence.read_golden()
+    assert len(records) == meta["classes"]
+    failures = equivalence.check_golden(records)
+    assert failures == {path: [] for path in equivalence.PATHS}
+
+
+def test_golden_readings_come_from_reference_engine():
+    _, records = equivalence.read_golden()
+    for birth, target, expected in records[::500]:
+        y, m, d = map(int, birth.split("-"))
+        assert equivalence.outcome(reference_engine.calculate_letter_data, "Subscriber", y, m, d, target) == expected
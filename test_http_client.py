@@ -0,0 +1,62 @@
+import http.server
+import threading
+
+from app import http_client
+
+
+def serve(statuses):
+    """Local server answering each request with the next status in `statuses`; returns (url, hits, server)."""
+    hits = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def answer(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            hits.append(self.command)
+            status = statuses[min(len(hits), len(statuses)) - 1]
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        do_GET = do_POST = answer
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/", hits, server
+
+
+def test_lob_session_retries_posts_on_429_and_5xx(monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF", 0.001)
+    url, hits, server = serve([429, 503, 200])
+    try:
+        response = http_client.request(http_client.lob_session.__wrapped__(), "POST", url)
+    finally:
+        server.shutdown()
+    assert response.status_code == 200 and hits == ["POST"] * 3
+
+
+def test_tiktok_session_does_not_retry_posts_and_stops_at_retry_limit(monkeypatch):
+    monkeypatch.setattr(http_client, "BACKOFF", 0.001)
+    url, hits, server = serve([500])
+    try:
+        session = http_client.tiktok_session.__wrapped__()
+        assert http_client.request(session, "POST", url).status_code == 500
+        assert hits == ["POST"]
+        assert http_client.request(session, "GET", url).status_code == 500
+    finally:
+        server.shutdown()
+    assert hits == ["POST"] + ["GET"] * (1 + http_client.RETRIES)
+
+
+def test_backoff_is_full_jitter_up_to_exponential(monkeypatch):
+    drawn = []
+    monkeypatch.setattr(http_client.random, "uniform", lambda low, high: drawn.append((low, high)) or high / 2)
+    retry = http_client.JitteredRetry(total=5, backoff_factor=0.5)
+    assert retry.get_backoff_time() == 0  # no failures yet: no sleep
+    for _ in range(3):
+        retry = retry.increment(method="GET", url="/")
+    assert retry.get_backoff_time() == 1.0
+    assert drawn == [(0, 2.0)]  # 0.5 * 2 ** (3 - 1)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+import pytest
+
+from app.jobs import JobQueue, run_job
+
+PAYLOAD = {
+    "first_name": "Cassidy", "birth_date": "1991-02-17", "target_month": "2026-03",
+    "address": {"name": "Cassidy", "address_line1": "123 Mystic Lane", "city": "Portland", "state": "OR", "zip_code": "97204"},
+}
+
+
+def test_claim_order_and_requeue_after_lease_expiry(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path, lease_seconds=0.2)
+    first, second = queue.enqueue(PAYLOAD), queue.enqueue(PAYLOAD)
+    assert queue.claim()[0] == first
+    assert queue.get(first)["status"] == "computing"
+
+    other = JobQueue(path, lease_seconds=0.2)  # another live process: the leased job stays put
+    assert other.get(first)["status"] == "computing"
+    assert other.claim()[0] == second
+    assert queue.renew(first) and not queue.renew(second)
+
+    time.sleep(0.25)  # first's owner stops renewing (crashed): its job goes back to the queue
+    other.renew(second)
+    assert other.claim()[0] == first and other.claim() is None
+    assert not queue.update(first, "rendering")
+    assert other.update(first, "rendering") and other.get(first)["status"] == "rendering"
+
+
+def test_run_job_records_lob_id(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    job_id = queue.enqueue(PAYLOAD)
+    seen = []
+
+    async def render(target_month, first_name, prose, data):
+        seen.append(queue.get(job_id)["status"])
+        return b"%PDF"
+
+    async def mail(pdf, address, idempotency_key):
+        assert idempotency_key == job_id
+        return {"id": "ltr_123"}
+
+    asyncio.run(run_job(queue, *queue.claim(), render, mail))
+    assert seen == ["rendering"]
+    assert queue.get(job_id)["status"] == "mailed" and queue.get(job_id)["lob_id"] == "ltr_123"
+
+
+def test_webhook_orders_dedup_and_bulk_enqueue(tmp_path):
+    from app import integrations
+    from app.orders import OrderLoader
+    from app.webhooks import OrderBatcher
+
+    calls = []
+    loader = OrderLoader(fetch=lambda ids: calls.append(list(ids)) or {i: integrations.mock_tiktok_order(i) for i in ids},
+                         window=0)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+
+    async def deliver():
+        batcher = OrderBatcher(queue, window=0, loader=loader)
+        accepted = [await batcher.receive(order_id) for order_id in ("A", "B", "A")]
+        await batcher.flush(list(batcher._pending))
+        return accepted
+
+    assert asyncio.run(deliver()) == [True, True, False]
+    assert calls == [["A", "B"]]
+    assert queue.pending_orders() == [] and queue.counts()["queued"] == 2
+
+
+def test_order_flushed_by_two_processes_gets_one_job(tmp_path):
+    from app import integrations
+    from app.orders import OrderLoader
+    from app.webhooks import OrderBatcher
+
+    path = str(tmp_path / "jobs.db")
+    JobQueue(path).remember_order("A")  # received, then the process restarted before enqueueing
+    loader = OrderLoader(fetch=lambda ids: {i: integrations.mock_tiktok_order(i) for i in ids}, window=0)
+
+    async def startup_flush(queue, order_ids):
+        batcher = OrderBatcher(queue, window=0, loader=loader)
+        await batcher.flush(order_ids)
+        return batcher.stats
+
+    # Both workers start together and both see A as still pending
+    first, second = JobQueue(path), JobQueue(path)
+    pending = [first.pending_orders(), second.pending_orders()]
+    assert pending == [["A"], ["A"]]
+    stats = [asyncio.run(startup_flush(queue, order_ids)) for queue, order_ids in zip((first, second), pending)]
+    assert [s["enqueued"] for s in stats] == [1, 0] and stats[1]["taken"] == 1
+    assert first.counts()["queued"] == 1
+    assert second.get_order("A")["job_id"] == first.claim()[0]
+
+
+def test_unhydratable_order_fails_after_max_attempts(tmp_path):
+    from app.orders import OrderLoader
+    from app.webhooks import OrderBatcher
+
+    def fetch(ids):
+        raise ConnectionError("TikTok down")
+
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+
+    async def deliver():
+        batcher = OrderBatcher(queue, window=0, retry_interval=0, max_attempts=2, loader=OrderLoader(fetch=fetch, window=0))
+        task = asyncio.create_task(batcher.run())
+        await batcher.receive("A")
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if queue.get_order("A")["status"] == "failed":
+                break
+        task.cancel()
+        assert not task.done() or task.cancelled()  # the batcher survived the failing flushes
+        return batcher.stats
+
+    stats = asyncio.run(deliver())
+    assert stats["retried"] == 1 and stats["failed"] == 1
+    order = queue.get_order("A")
+    assert order["status"] == "failed" and "TikTok down" in order["error"]
+    assert queue.pending_orders() == []
+
+
+def test_order_loader_coalesces_and_caches():
+    import threading
+    from app.orders import OrderLoader, OrderLookupError
+
+    calls = []
+    loader = OrderLoader(fetch=lambda ids: calls.append(list(ids)) or {i: {"order_id": i} for i in ids if i != "X"},
+                         window=0.05)
+    threads = [threading.Thread(target=loader.load_many, args=(["A", "B", "X"],)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [["A", "B", "X"]]
+
+    assert loader.load("A") == {"order_id": "A"} and len(calls) == 1
+    with pytest.raises(OrderLookupError):
+        loader.load("X")  # failures are not cached
+    assert calls[-1] == ["X"]
+
+    slow = OrderLoader(fetch=lambda ids: time.sleep(0.3) or {i: {"order_id": i} for i in ids}, window=0)
+    with pytest.raises(OrderLookupError, match="timed out"):
+        slow.load("S", timeout=0.05)
@@ -0,0 +1,41 @@
+import pytest
+
+from app.journal import Journal
+
+
+def test_resume_after_torn_write(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with Journal(str(path)) as journal:
+        journal.record("a", "computed")
+        journal.record("a", "rendered", pdf="a.pdf")
+        journal.record("b", "computed")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b", "stage": "rend')  # crash mid-write
+
+    with Journal(str(path)) as journal:
+        assert journal.done("a", "rendered") and not journal.done("a", "mailed")
+        assert journal.get("a")["pdf"] == "a.pdf"
+        assert journal.done("b", "computed") and not journal.done("b", "rendered")
+        journal.record("b", "rendered", pdf="b.pdf")
+    assert path.read_text(encoding="utf-8").endswith('"pdf": "b.pdf"}\n')
+
+
+def test_compaction_keeps_merged_records(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    with Journal(str(path)) as journal:
+        for stage, fields in (("computed", {}), ("rendered", {"pdf": "a.pdf"}), ("mailed", {"lob_id": "ltr_1"})):
+            journal.record("a", stage, **fields)
+
+    with Journal(str(path)) as journal:
+        assert journal.lines == 1
+        assert journal.get("a")["stage"] == "mailed"
+        assert journal.get("a")["pdf"] == "a.pdf" and journal.get("a")["lob_id"] == "ltr_1"
+        journal.record("c", "computed")
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_corrupt_record_before_the_end_is_an_error(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text('{"key": "a", "stage": "computed"}\nnot json\n{"key": "b", "stage": "computed"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="line 2"):
+        Journal(str(path))
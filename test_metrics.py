@@ -0,0 +1,49 @@
+import logging
+
+from app import metrics
+from app.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    sent = Counter("sent_total", "Letters sent.", ("stage",), registry=registry)
+    Gauge("depth", "Queue depth.", ("status",), fn=lambda: {"queued": 3}, registry=registry)
+    seconds = Histogram("work_seconds", "Work time.", buckets=(0.1, 1.0), registry=registry)
+    sent.inc(stage="mail")
+    sent.inc(2, stage="mail")
+    seconds.observe(0.05)
+    seconds.observe(0.5)
+    assert registry.render().splitlines() == [
+        "# HELP sent_total Letters sent.",
+        "# TYPE sent_total counter",
+        'sent_total{stage="mail"} 3',
+        "# HELP depth Queue depth.",
+        "# TYPE depth gauge",
+        'depth{status="queued"} 3',
+        "# HELP work_seconds Work time.",
+        "# TYPE work_seconds histogram",
+        'work_seconds_bucket{le="0.1"} 1',
+        'work_seconds_bucket{le="1"} 2',
+        'work_seconds_bucket{le="+Inf"} 2',
+        "work_seconds_sum 0.55",
+        "work_seconds_count 2",
+    ]
+
+
+def test_stage_counts_failures_and_logs_carry_request_id(caplog):
+    before = metrics.LETTERS_FAILED.value(stage="test_stage")
+    try:
+        with metrics.stage("test_stage"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert metrics.LETTERS_FAILED.value(stage="test_stage") == before + 1
+    assert metrics.STAGE_SECONDS.count(stage="test_stage") == 0
+
+    caplog.handler.addFilter(metrics.RequestIdFilter())
+    token = metrics.request_id.set("req-42")
+    try:
+        logging.getLogger("app.test").warning("slow letter")
+    finally:
+        metrics.request_id.reset(token)
+    assert caplog.records[-1].request_id == "req-42"
@@ -0,0 +1,52 @@
+import os
+
+from app.pdf_cache import PDFCache, cache_key
+
+
+def test_hit_miss_and_key_inputs(tmp_path):
+    cache = PDFCache(str(tmp_path))
+    key = cache_key("v1", "<html>Cassidy</html>")
+    assert key != cache_key("v2", "<html>Cassidy</html>")
+    assert key != cache_key("v1", "<html>Jordan</html>")
+    assert cache.get(key) is None
+    cache.put(key, b"%PDF-1.7 letter")
+    assert cache.get(key) == b"%PDF-1.7 letter"
+    assert PDFCache(str(tmp_path)).get(key) == b"%PDF-1.7 letter"  # shared across processes via disk
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=250)
+    keys = [cache_key("v1", str(i)) for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, b"%PDF" + b"x" * 96)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    assert cache.evictions == 1 and cache.size == 200
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None and cache.get(keys[2]) is not None
+
+
+def test_overwriting_an_entry_counts_its_size_once(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=250)
+    key = cache_key("v1", "Cassidy")
+    for _ in range(5):  # same letter re-rendered (e.g. two processes racing on a miss)
+        cache.put(key, b"%PDF" + b"x" * 96)
+    assert cache.size == 100 and cache.evictions == 0
+    cache.put(key, b"%PDF" + b"x" * 46)
+    assert cache.size == 50
+
+
+def test_unwritable_or_corrupt_entries_are_misses(tmp_path, monkeypatch):
+    cache = PDFCache(str(tmp_path))
+    key = cache_key("v1", "<html>Cassidy</html>")
+    os.makedirs(os.path.dirname(cache._path(key)))
+    with open(cache._path(key), "wb") as f:
+        f.write(b"\0\0 truncated")
+    assert cache.get(key) is None and not os.path.exists(cache._path(key))
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(os, "replace", disk_full)
+    assert cache.put(key, b"%PDF-1.7 letter") is False
+    assert cache.get(key) is None and cache.size == 0
+    assert os.listdir(os.path.dirname(cache._path(key))) == []  # no temp file left behind
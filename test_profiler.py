@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from app import profiler
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_finds_busy_function_and_round_trips_collapsed():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        sampler = profiler.begin(interval=0.002)
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.begin()
+        time.sleep(0.2)
+    finally:
+        profiler.end(sampler)
+        stop.set()
+        worker.join()
+    assert profiler.active() is None
+    assert sampler.samples > 10
+
+    spinner = {stack: n for stack, n in sampler.counts.items() if stack[0] == "spinner"}
+    assert spinner and all(any(frame.startswith("spin (test_profiler.py:") for frame in stack) for stack in spinner)
+    assert profiler.parse_collapsed(sampler.collapsed()) == sampler.counts
+    top = profiler.hotspots(spinner, top=1)[0]
+    assert top["total"] == sum(n for stack, n in spinner.items() if top["frame"] in stack) >= top["self"]
+
+
+def test_every_kth_request_keeps_newest_files(tmp_path):
+    middleware = profiler.EveryKthRequestProfiler(None, every=1, directory=str(tmp_path), keep=2)
+    sampler = profiler.Sampler()
+    sampler.add({("MainThread", "handler (app/server.py:1)"): 3})
+    for name in ("20260101-000000-000000-a", "20260101-000001-000001-b", "20260101-000002-000002-c"):
+        middleware.write(sampler, name)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["20260101-000001-000001-b.collapsed", "20260101-000002-000002-c.collapsed"]
+    assert (tmp_path / "20260101-000002-000002-c.collapsed").read_text() == "MainThread;handler (app/server.py:1) 3\n"
@@ -0,0 +1,51 @@
+import os
+import time
+
+import pytest
+
+from app.renderer import RendererPool, RenderTimeout
+
+
+def stub_worker(conn):
+    # Same pipe protocol as renderer._worker_main; the first argument picks the behaviour
+    conn.send(("ready", os.getpid()))
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        (action, value), _, _ = job
+        if action == "sleep":
+            time.sleep(value)
+        elif action == "crash":
+            os._exit(1)
+        conn.send((True, os.getpid(), 0.0, None, None))
+
+
+def test_stuck_render_times_out_and_worker_is_replaced():
+    with RendererPool(workers=1, timeout=0.5, target=stub_worker) as pool:
+        first = pool.render("sleep", 0).output
+        with pytest.raises(RenderTimeout):
+            pool.render("sleep", 30)
+        second = pool.render("sleep", 0).output
+        stats = pool.stats()
+    assert second != first
+    assert stats["timeouts"] == 1 and stats["failed"] == 1 and stats["jobs"] == 2
+
+
+def test_crashed_worker_fails_its_job_and_is_replaced():
+    with RendererPool(workers=1, timeout=10, target=stub_worker) as pool:
+        first = pool.render("sleep", 0).output
+        with pytest.raises(RuntimeError, match="render worker failed"):
+            pool.render("crash", None)
+        second = pool.render("sleep", 0).output
+        stats = pool.stats()
+    assert second != first
+    assert stats["timeouts"] == 0 and stats["failed"] == 1 and stats["jobs"] == 2
+
+
+def test_worker_is_recycled_after_max_jobs():
+    with RendererPool(workers=1, max_jobs_per_worker=2, target=stub_worker) as pool:
+        pids = [pool.render("sleep", 0).output for _ in range(3)]
+        stats = pool.stats()
+    assert pids[0] == pids[1] != pids[2]
+    assert stats["recycled"] == 1 and stats["jobs"] == 3
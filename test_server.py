@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+from app import server
+from app.renderer import RenderTimeout
+
+LETTER = {"first_name": "Cassidy", "birth_date": "1991-02-17", "target_month": "2026-03"}
+
+
+def post(path, body):
+    """One request straight through the ASGI app (no lifespan); returns (status, headers, JSON body)."""
+    messages = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+    asyncio.run(server.app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], {k.decode().lower(): v.decode() for k, v in start["headers"]}, json.loads(body)
+
+
+def test_generate_test_rejects_with_retry_after_when_full(monkeypatch):
+    monkeypatch.setattr(server.app.state, "pending", server.MAX_PENDING_LETTERS, raising=False)
+    status, headers, body = post("/admin/generate-test", LETTER)
+    assert status == 503 and headers["retry-after"] == "1"
+    assert "retry shortly" in body["detail"]
+    assert server.app.state.pending == server.MAX_PENDING_LETTERS  # a rejected request holds no slot
+
+
+def test_render_timeout_is_a_503_and_frees_its_slot(monkeypatch):
+    async def stuck(*args):
+        raise RenderTimeout("render exceeded 30s")
+
+    monkeypatch.setattr(server.app.state, "pending", 0, raising=False)
+    monkeypatch.setattr(server, "render_letter", stuck)
+    status, headers, body = post("/admin/generate-test", LETTER)
+    assert status == 503 and headers["retry-after"] == "5"
+    assert server.app.state.pending == 0
@@ -0,0 +1,243 @@
+# tools/equivalence.py - Differential check of the optimized engine against the original
+#
+#   python -m tools.equivalence                            # full enumeration on every core
+#   python -m tools.equivalence --stride 7 --workers 4     # every 7th target day
+#   python -m tools.equivalence --write-golden             # also refresh the CI golden file
+#
+# The input space is small enough to enumerate: every birth month/day (Feb 29 in leap birth
+# years), every birth year that reaches a distinct spread year (plus future births), and every
+# target day of the --target-years (a common and a leap year by default). Each birth year is
+# one task on a process pool. A task runs tools/reference_engine.py, the frozen original
+# engine, and every optimized path on the same inputs and compares the results field by field.
+# The optimized paths are the scalar and NumPy batch engines, each with the mmap'd reading
+# table and without it (spread store). Exceptions count as results too: the original raises
+# IndexError when the period falls past a short chain, and so must every path.
+#
+# --write-golden keeps one input per distinct reading class (birth card x spread year x
+# period x outcome, plus the Feb 29 and age-clamp edges) together with the reference result.
+# test_equivalence.py replays that file against the optimized engine in a couple of seconds.
+
+import argparse
+import calendar
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from app import dates, engine
+
+from . import reference_engine
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_readings.jsonl.gz")
+DEFAULT_TARGET_YEARS = (2026, 2028)
+PATHS = ("scalar", "scalar_spreads", "batch", "batch_spreads")
+MAX_EXAMPLES = 5
+
+# ====================== OUTCOMES ======================
+# A result is normalized to a flat list so paths can be compared and stored compactly:
+#   ["ok", birth_card, age, spread_year, period_card, planet, days_since,
+#    long_range, pluto, result, displacement, environment]
+#   ["error", message]          (the Joker)
+#   ["raise", exception type]   (IndexError on a short chain)
+
+def normalize(data):
+    if "error" in data:
+        return ["error", data["error"]]
+    period, year_long = data["period"], data["year_long"]
+    return ["ok", data["birth_card"], data["age"], data["spread_year"], period["card"], period["planet"],
+            period["days_since"], year_long["long_range"], year_long["pluto"], year_long["result"],
+            year_long["displacement"], year_long["environment"]]
+
+def outcome(fn, *args):
+    try:
+        return normalize(fn(*args))
+    except Exception as e:
+        return ["raise", type(e).__name__]
+
+@contextlib.contextmanager
+def reading_table_disabled():
+    """Forces the engine onto its spread-store path (as with READING_TABLE_PATH="")."""
+    saved = engine._reading_table, engine.READING_TABLE_PATH
+    engine._reading_table, engine.READING_TABLE_PATH = None, ""
+    try:
+        yield
+    finally:
+        engine._reading_table, engine.READING_TABLE_PATH = saved
+
+def batch_outcomes(birth_years, months, days, targets):
+    batch = engine.calculate_letter_data_batch(birth_years, months, days, targets)
+    return [outcome(engine.letter_data_from_batch, batch, i, "Subscriber") for i in range(len(birth_years))]
+
+def reading_class(birth, target, result):
+    """Golden-file class of a reference result: which part of the reading space it covers."""
+    if result[0] == "error":
+        return (result[0], result[1], birth[1:] == (2, 29))
+    if result[0] == "raise":
+        # The reference only reports the exception; place it with the date helpers instead.
+        _, _, spread_year, period_idx, _ = dates.spread_position(*birth, target.year, target.toordinal())
+        return (result[0], result[1], 55 - (birth[1] * 2 + birth[2]), spread_year, period_idx)
+    age, spread_year, days_since = result[2], result[3], result[6]
+    period_idx = min((days_since - 1) // 52, 6)
+    return ("ok", result[1], spread_year, period_idx, birth[1:] == (2, 29), age + 1 < 1, age + 1 > 90)
+
+# ====================== ENUMERATION ======================
+
+def birthdays(birth_year):
+    """Every month/day a person born in birth_year can have (Feb 29 only in leap years)."""
+    return [(m, d) for m in range(1, 13) for d in range(1, calendar.monthrange(birth_year, m)[1] + 1)]
+
+def target_days(years, stride=1):
+    days = []
+    for year in years:
+        first = datetime.date(year, 1, 1).toordinal()
+        days += [datetime.date.fromordinal(o) for o in range(first, datetime.date(year, 12, 31).toordinal() + 1, stride)]
+    return days
+
+def check_birth_year(birth_year, targets, collect_golden=False):
+    """Compares every path with the reference for one birth year; returns a summary dict."""
+    inputs = [(birth_year, m, d, t) for m, d in birthdays(birth_year) for t in targets]
+    seconds = dict.fromkeys(("reference",) + PATHS, 0.0)
+
+    started = time.perf_counter()
+    expected = [outcome(reference_engine.calculate_letter_data, "Subscriber", y, m, d, t.isoformat())
+                for y, m, d, t in inputs]
+    seconds["reference"] = time.perf_counter() - started
+
+    def scalar():
+        return [outcome(engine.calculate_letter_data, "Subscriber", y, m, d, t.isoformat()) for y, m, d, t in inputs]
+
+    def batch():
+        columns = list(zip(*inputs))
+        return batch_outcomes(np.array(columns[0]), np.array(columns[1]), np.array(columns[2]),
+                              np.array([t.isoformat() for t in columns[3]], dtype="datetime64[D]"))
+
+    actual = {}
+    for path in PATHS:
+        started = time.perf_counter()
+        with reading_table_disabled() if path.endswith("_spreads") else contextlib.nullcontext():
+            actual[path] = scalar() if path.startswith("scalar") else batch()
+        seconds[path] = time.perf_counter() - started
+
+    mismatches = {path: 0 for path in PATHS}
+    examples = []
+    for i, want in enumerate(expected):
+        for path in PATHS:
+            got = actual[path][i]
+            if got != want:
+                mismatches[path] += 1
+                if len(examples) < MAX_EXAMPLES:
+                    y, m, d, t = inputs[i]
+                    examples.append({"path": path, "birth": f"{y:04d}-{m:02d}-{d:02d}", "target": t.isoformat(),
+                                     "expected": want, "actual": got})
+
+    golden = {}
+    if collect_golden:
+        for (y, m, d, t), want in zip(inputs, expected):
+            golden.setdefault(reading_class((y, m, d), t, want), [f"{y:04d}-{m:02d}-{d:02d}", t.isoformat(), want])
+    return {"birth_year": birth_year, "rows": len(inputs), "seconds": seconds, "mismatches": mismatches,
+            "examples": examples, "golden": golden}
+
+# ====================== GOLDEN FILE ======================
+
+def write_golden(records, path=GOLDEN_PATH, meta=None):
+    """Writes golden records ([birth, target, expected outcome]) as gzipped JSON lines."""
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8", compresslevel=9) as f:
+        f.write(json.dumps({"meta": meta or {}}, ensure_ascii=False) + "\n")
+        for record in sorted(records):
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    os.replace(path + ".tmp", path)
+
+def read_golden(path=GOLDEN_PATH):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = iter(f)
+        meta = json.loads(next(lines))["meta"]
+        return meta, [json.loads(line) for line in lines]
+
+def check_golden(records, paths=PATHS):
+    """Replays golden records against the optimized paths; returns {path: [mismatching records]}."""
+    parsed = [tuple(map(int, birth.split("-"))) + (target,) for birth, target, _ in records]
+    expected = [want for _, _, want in records]
+    failures = {}
+    for path in paths:
+        with reading_table_disabled() if path.endswith("_spreads") else contextlib.nullcontext():
+            if path.startswith("scalar"):
+                actual = [outcome(engine.calculate_letter_data, "Subscriber", y, m, d, t) for y, m, d, t in parsed]
+            else:
+                y, m, d, t = (np.array(column) for column in zip(*parsed))
+                actual = batch_outcomes(y, m, d, t.astype("datetime64[D]"))
+        failures[path] = [record for record, got, want in zip(records, actual, expected) if got != want]
+    return failures
+
+# ====================== CLI ======================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the optimized engine against the original, exhaustively.")
+    parser.add_argument("--target-years", default=",".join(map(str, DEFAULT_TARGET_YEARS)),
+                        help="Comma-separated target years; every day of each is checked")
+    parser.add_argument("--birth-years", default=None,
+                        help="first-last birth years (default: 95 years before the first target year to one after the last)")
+    parser.add_argument("--stride", type=int, default=1, help="Check every n-th target day only")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per core)")
+    parser.add_argument("--write-golden", nargs="?", const=GOLDEN_PATH, default=None, metavar="PATH",
+                        help=f"Write the golden file for CI (default path {os.path.relpath(GOLDEN_PATH)})")
+    parser.add_argument("--report", default=None, help="Also write the summary as JSON to this path")
+    args = parser.parse_args(argv)
+
+    target_years = [int(year) for year in args.target_years.split(",")]
+    if args.birth_years:
+        first, last = (int(year) for year in args.birth_years.split("-"))
+    else:
+        first, last = min(target_years) - engine.MAX_SPREAD_YEAR - 5, max(target_years) + 1
+    targets = target_days(target_years, args.stride)
+
+    started = time.perf_counter()
+    rows, done = 0, 0
+    seconds = dict.fromkeys(("reference",) + PATHS, 0.0)
+    mismatches = {path: 0 for path in PATHS}
+    examples, golden = [], {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(check_birth_year, year, targets, bool(args.write_golden)) for year in range(first, last + 1)]
+        for future in as_completed(futures):
+            result = future.result()
+            done += 1
+            rows += result["rows"]
+            for name, value in result["seconds"].items():
+                seconds[name] += value
+            for path, count in result["mismatches"].items():
+                mismatches[path] += count
+            examples += result["examples"][:MAX_EXAMPLES - len(examples)]
+            for key, record in result["golden"].items():
+                golden.setdefault(key, record)
+            elapsed = time.perf_counter() - started
+            print(f"{done}/{len(futures)} birth years, {rows} inputs ({rows / elapsed:.0f}/sec)", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    summary = {
+        "inputs": rows,
+        "birth_years": [first, last],
+        "target_years": target_years,
+        "stride": args.stride,
+        "seconds": round(elapsed, 2),
+        "inputs_per_sec": round(rows / elapsed, 1),
+        "path_rows_per_sec": {name: round(rows / value, 1) if value else None for name, value in seconds.items()},
+        "mismatches": mismatches,
+        "examples": examples,
+    }
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.write_golden:
+        meta = {key: summary[key] for key in ("inputs", "birth_years", "target_years", "stride")}
+        write_golden(list(golden.values()), args.write_golden, meta | {"classes": len(golden)})
+        print(f"Golden file: {len(golden)} classes -> {args.write_golden}", file=sys.stderr)
+    return 1 if any(mismatches.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
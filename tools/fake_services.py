@@ -0,0 +1,141 @@
+# tools/fake_services.py - Local fake Lob and TikTok Shop APIs for load testing
+#
+#   python tools/fake_services.py --latency 0.2 --error-rate 0.02 --lob-limit 150 --lob-window 5
+#
+# then point the app at it (any non-empty credentials will do):
+#
+#   LOB_API_BASE=http://127.0.0.1:8900/v1 TIKTOK_API_BASE=http://127.0.0.1:8900 \
+#   LOB_API_KEY=test TIKTOK_APP_KEY=test TIKTOK_APP_SECRET=test TIKTOK_ACCESS_TOKEN=test \
+#   uvicorn app.server:app
+#
+# Every request waits a random latency (--latency mean, --jitter spread) and fails with a 500
+# or 503 at --error-rate. Lob letter creation enforces a fixed-window rate limit with Lob's
+# X-Rate-Limit-* headers and answers 429 + Retry-After past it, and replays the original
+# letter for a repeated Idempotency-Key. The TikTok order query answers order_id_list
+# requests with generated orders. GET /stats reports what the fakes have seen.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class FixedWindowLimiter:
+    """Allows `limit` requests per `window` seconds, like Lob's 150 per 5 seconds."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._start = time.time()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Returns (allowed, remaining, reset_epoch) for one request."""
+        with self._lock:
+            now = time.time()
+            if now - self._start >= self.window:
+                self._start, self._count = now, 0
+            reset = self._start + self.window
+            if self.limit and self._count >= self.limit:
+                return False, 0, reset
+            self._count += 1
+            return True, (self.limit - self._count if self.limit else 1000), reset
+
+def fake_order(order_id):
+    """A deterministic TikTok order payload (the shape integrations._parse_tiktok_order reads)."""
+    seed = int(hashlib.sha256(order_id.encode()).hexdigest()[:8], 16)
+    return {
+        "order_id": order_id,
+        "buyer_email": f"buyer{seed % 10000}@example.com",
+        "recipient_address": {
+            "name": random.Random(seed).choice(["Ava", "Noah", "Mia", "Leo", "Zoe", "Eli"]),
+            "address_line1": f"{seed % 9000 + 100} Test St",
+            "city": "Portland",
+            "state": "OR",
+            "zip_code": "97204",
+        },
+    }
+
+def create_app(latency=0.0, jitter=0.0, error_rate=0.0, lob_limit=150, lob_window=5.0, seed=None):
+    app = FastAPI(title="Fake Lob / TikTok Shop")
+    rng = random.Random(seed)
+    limiter = FixedWindowLimiter(lob_limit, lob_window)
+    letters = {}  # Idempotency-Key -> letter ID
+    stats = {"lob_requests": 0, "lob_created": 0, "lob_replayed": 0, "lob_throttled": 0,
+             "tiktok_requests": 0, "tiktok_orders": 0, "errors": 0}
+
+    async def delay_or_fail():
+        """Sleeps the configured latency; returns an error response at error_rate."""
+        await asyncio.sleep(max(0.0, rng.gauss(latency, jitter) if jitter else latency))
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            status = rng.choice((500, 503))
+            return JSONResponse({"error": {"message": "fake upstream failure", "status_code": status}}, status_code=status)
+        return None
+
+    @app.post("/v1/letters")
+    async def create_letter(request: Request):
+        stats["lob_requests"] += 1
+        await request.body()  # drain the multipart upload like the real service would
+        allowed, remaining, reset = limiter.take()
+        headers = {"X-Rate-Limit-Limit": str(lob_limit), "X-Rate-Limit-Remaining": str(remaining),
+                   "X-Rate-Limit-Reset": str(int(reset) + 1)}
+        if not allowed:
+            stats["lob_throttled"] += 1
+            headers["Retry-After"] = str(max(1, int(reset - time.time()) + 1))
+            return JSONResponse({"error": {"message": "rate limit exceeded", "status_code": 429}},
+                                status_code=429, headers=headers)
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        key = request.headers.get("Idempotency-Key") or uuid.uuid4().hex
+        if key in letters:
+            stats["lob_replayed"] += 1
+        else:
+            stats["lob_created"] += 1
+            letters[key] = f"ltr_{uuid.uuid4().hex[:16]}"
+        return JSONResponse({"id": letters[key], "object": "letter"}, headers=headers)
+
+    @app.get("/api/orders/detail/query")
+    async def order_detail(order_id_list: str = "[]"):
+        stats["tiktok_requests"] += 1
+        failure = await delay_or_fail()
+        if failure is not None:
+            return failure
+        order_ids = [str(order_id) for order_id in json.loads(order_id_list)]
+        stats["tiktok_orders"] += len(order_ids)
+        return {"code": 0, "message": "Success", "data": {"order_list": [fake_order(o) for o in order_ids]}}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run fake Lob and TikTok Shop APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_PORT", 8900)))
+    parser.add_argument("--latency", type=float, default=float(os.getenv("FAKE_LATENCY", 0.1)), help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=float(os.getenv("FAKE_JITTER", 0.03)), help="Latency standard deviation in seconds")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("FAKE_ERROR_RATE", 0.0)), help="Fraction of requests answered with 500/503")
+    parser.add_argument("--lob-limit", type=int, default=int(os.getenv("FAKE_LOB_LIMIT", 150)), help="Lob letters per window (0: unlimited)")
+    parser.add_argument("--lob-window", type=float, default=float(os.getenv("FAKE_LOB_WINDOW", 5)), help="Lob rate-limit window in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and error draws")
+    args = parser.parse_args()
+    app = create_app(args.latency, args.jitter, args.error_rate, args.lob_limit, args.lob_window, args.seed)
+    print(f"Fake Lob:    LOB_API_BASE=http://{args.host}:{args.port}/v1")
+    print(f"Fake TikTok: TIKTOK_API_BASE=http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# tools/loadgen.py - Open-loop load generator for the letter server
+#
+#   python tools/loadgen.py --url http://127.0.0.1:8000 --rates 1,2,4,8 --duration 30
+#
+# Sends requests at a fixed rate per step (open loop: a slow server does not slow the
+# generator down, so queueing shows up as latency and 503s, as it would under a promotion)
+# and prints throughput, p50/p95/p99 latency and errors by status for each step. Stepping
+# the rate up finds the saturation point: the first step whose completed rate falls behind
+# the offered rate or whose p99 takes off.
+#
+# The default target is POST /admin/generate-test with a varied sample subscriber;
+# --path/--body drive any other route, e.g. --path /letters with an address in --body.
+# --tiktok-webhook sends order webhooks with fresh order IDs to /webhook/tiktok, signed with
+# TIKTOK_APP_KEY/TIKTOK_APP_SECRET when they are set (run the server against
+# tools/fake_services.py so the orders can be hydrated).
+
+import argparse
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+NAMES = ["Ava", "Noah", "Mia", "Leo", "Zoe", "Eli", "Ivy", "Max"]
+
+def sample_body(i, target_month="2026-03"):
+    """A test-letter request for a different birth date each time."""
+    rng = random.Random(i)
+    return {
+        "first_name": rng.choice(NAMES),
+        "birth_date": f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "target_month": target_month,
+    }
+
+def webhook_request(i, run_id):
+    """Signed request kwargs for a TikTok order webhook (see integrations.verify_tiktok_signature)."""
+    body = json.dumps({"type": 1, "data": {"order_id": f"load-{run_id}-{i}"}}).encode()
+    headers = {"Content-Type": "application/json"}
+    app_key, app_secret = os.getenv("TIKTOK_APP_KEY"), os.getenv("TIKTOK_APP_SECRET")
+    if app_key and app_secret:
+        headers["Authorization"] = hmac.new(app_secret.encode(), app_key.encode() + body, hashlib.sha256).hexdigest()
+    return {"data": body, "headers": headers}
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+class Step:
+    """Outcomes of one fixed-rate step."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.latencies = []
+        self.statuses = {}
+        self.sent = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, status, seconds):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 200 or status == 202:
+                self.latencies.append(seconds)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        ok = len(latencies)
+        return {
+            "offered_rps": self.rate,
+            "sent": self.sent,
+            "ok": ok,
+            "throughput_rps": round(ok / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "errors": {str(status): count for status, count in sorted(self.statuses.items(), key=str)
+                       if status not in (200, 202)},
+        }
+
+def run_step(session, url, method, make_request, rate, duration, timeout, max_in_flight, counter):
+    step = Step(rate)
+    pool = ThreadPoolExecutor(max_workers=max_in_flight)
+    slots = threading.BoundedSemaphore(max_in_flight)
+
+    def send(kwargs):
+        started = time.perf_counter()
+        try:
+            status = session.request(method, url, timeout=timeout, **kwargs).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        finally:
+            slots.release()
+        step.record(status, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    interval = 1.0 / rate
+    for n in itertools.count():
+        due = started + n * interval
+        if due - started >= duration:
+            break
+        time.sleep(max(0.0, due - time.perf_counter()))
+        if not slots.acquire(blocking=False):
+            step.record("dropped", 0.0)  # generator-side limit hit: the server is far behind
+            continue
+        step.sent += 1
+        pool.submit(send, make_request(next(counter)))
+    pool.shutdown(wait=True)
+    step.elapsed = time.perf_counter() - started
+    return step
+
+def format_row(s):
+    ms = lambda v: f"{v * 1000:8.0f}" if v is not None else "       -"
+    errors = ", ".join(f"{k}={v}" for k, v in s["errors"].items()) or "-"
+    return (f"{s['offered_rps']:8.1f} {s['throughput_rps']:8.2f} {s['sent']:6d} {s['ok']:6d} "
+            f"{ms(s['p50'])} {ms(s['p95'])} {ms(s['p99'])}  {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the letter server at fixed request rates.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server base URL")
+    parser.add_argument("--path", default="/admin/generate-test", help="Route to drive")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--body", default=None, help="JSON body sent with every request (default: varied sample subscribers)")
+    parser.add_argument("--month", default="2026-03", help="target_month of the sample subscribers")
+    parser.add_argument("--tiktok-webhook", action="store_true", help="Send signed order webhooks to /webhook/tiktok")
+    parser.add_argument("--rates", default="2", help="Comma-separated requests per second, one step each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Requests outstanding at once before new ones are dropped")
+    parser.add_argument("--json", action="store_true", help="Print one JSON summary per step instead of a table")
+    args = parser.parse_args()
+
+    if args.tiktok_webhook:
+        args.path, run_id = "/webhook/tiktok", uuid.uuid4().hex[:8]
+        make_request = lambda i: webhook_request(i, run_id)
+    elif args.body:
+        fixed = json.loads(args.body)
+        make_request = lambda i: {"json": fixed}
+    else:
+        make_request = lambda i: {"json": sample_body(i, args.month)}
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.max_in_flight)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    url = args.url.rstrip("/") + args.path
+    counter = itertools.count()
+
+    if not args.json:
+        print(f"{args.method} {url}, {args.duration:g}s per step")
+        print(f"{'offered':>8} {'rps':>8} {'sent':>6} {'ok':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errors")
+    for rate in (float(r) for r in args.rates.split(",")):
+        summary = run_step(session, url, args.method, make_request, rate, args.duration,
+                           args.timeout, args.max_in_flight, counter).summary()
+        print(json.dumps(summary) if args.json else format_row(summary))
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()